@@ -10,6 +10,7 @@ import pathlib
 import datetime
 import sys
 from typing import List, Dict, Tuple
+from columnar_io import write_columnar
 
 
 def get_excel_files(source_dir: pathlib.Path) -> List[pathlib.Path]:
@@ -166,6 +167,7 @@ def main():
     
     # Write output
     write_with_retry(combined_df, output_file)
+    write_columnar(combined_df, output_file)
     
     # Generate quality report
     create_quality_report(file_stats, len(combined_df), quality_report_file)
@@ -16,6 +16,7 @@ from datetime import datetime
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
 from urllib.parse import urljoin
+from columnar_io import write_columnar
 
 
 # ============================================================================
@@ -237,6 +238,7 @@ def save_records_to_csv(records: List[Dict], output_file: pathlib.Path) -> int:
     
     # Save to CSV
     df.to_csv(output_file, index=False, encoding='utf-8')
+    write_columnar(df, output_file)
     
     print(f"✓ Saved to: {output_file}")
     print(f"  Rows: {len(df):,}")
@@ -5,10 +5,20 @@ Extracts all MIG RIM IDs from filtered RIM data and analyzes MVS data.
 Shows which MVS Unique IDs are found in RIM set, count of occurrences, and Out of Scope status.
 """
 
+import argparse
+import datetime
+import itertools
+import numpy as np
 import pandas as pd
 import pathlib
+import re
 import sys
-from typing import Set, Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+from columnar_io import mask_csv_missing, read_stage_output, stage_output_columns, write_columnar
+from dataset_registry import publish_dataset, wait_for_unlock, write_in_background
+from scope_classification import IN_SCOPE_COLUMN, classify_in_scope
 
 
 def extract_rim_ids(rim_file: pathlib.Path) -> Dict[str, int]:
@@ -215,39 +225,6 @@ def extract_rim_additional_data(rim_file: pathlib.Path) -> tuple[Dict[str, str],
     return rim_greenlight_date, rim_additional_info, rim_record_id
 
 
-def is_in_scope_fuzzy(out_of_scope_value: str) -> bool:
-    """Check if a value indicates 'In Scope' using fuzzy matching."""
-    if pd.isna(out_of_scope_value) or not str(out_of_scope_value).strip():
-        return False
-
-    value = str(out_of_scope_value).strip().lower()
-
-    # Fuzzy match for "in scope" variations
-    in_scope_patterns = [
-        "in scope",
-        "inscope",
-        "in-scope",
-        "scope in",
-        "scopein"
-    ]
-
-    # Check if any in-scope pattern is found
-    for pattern in in_scope_patterns:
-        if pattern in value:
-            return True
-
-    # Additional check for variations like "scope: in" or "in: scope"
-    if "scope" in value and "in" in value:
-        # Make sure it's not "out of scope" or similar
-        if "out" not in value and "not" not in value:
-            return True
-
-    return False
-
-
-
-
-
 def find_drug_products_in_loader_create_optimized(unique_id: str, df_create: pd.DataFrame, df_drug: pd.DataFrame) -> str:
     """Find drug products for a unique ID through loader create chain using pre-loaded data."""
     if 'external_id__v' not in df_create.columns:
@@ -416,202 +393,498 @@ def load_product_data(product_file: pathlib.Path) -> pd.DataFrame:
     return df[['id', 'name__v']]
 
 
-def analyze_mvs_data(mvs_file: pathlib.Path, rim_ids: Dict[str, int], create_ids: Dict[str, int], update_ids: Dict[str, int],
-                    create_greenlight: Dict[str, str], update_greenlight: Dict[str, str], rim_greenlight: Dict[str, str],
-                    rim_product_family: Dict[str, str], rim_greenlight_date: Dict[str, str], 
-                    rim_additional_info: Dict[str, str], rim_record_id: Dict[str, str]) -> List[Dict]:
-    """Analyze MVS data to show which MVS IDs are found in RIM set."""
+# MVS column names
+MVS_UNIQUE_ID_COL = 'Unique ID'
+MVS_OUT_OF_SCOPE_COL = 'Is the line Out Of Scope of the migration? = no active license or not owned by AGI anymore (divested)'
+MVS_GREEN_LIGHT_COL = 'Green light for change to be implemented at site- by REG\nYES/NO'
+MVS_MOLECULE_COL = 'Molecule'
+MVS_IMPLEMENTATION_RULES_COL = 'Implementation Rules'
+MVS_VALIDATION_DATE_COL = 'Validation date for Green light for change to be implemented at site- by REG'
+
+# Low-cardinality text columns stored as categoricals in the result table
+CATEGORICAL_COLUMNS = [
+    'Out_of_Scope',
+    'Found_in_RIM',
+    'Green_Light_MVS',
+    'Greenlight_RO_Loader_Create',
+    'Greenlight_RO_Loader_Update',
+    'Greenlight_RIM',
+    'MVS_Molecule',
+    'RIM_Product_Name',
+    'Greenlight_Consistency',
+    'Greenlight_Date_Mismatch',
+]
+
+# Integer count columns stored as compact integers in the result table
+COUNT_COLUMNS = [
+    'Count_in_MVS',
+    'Count_in_RO_Loader_Create',
+    'Count_in_RO_Loader_Update',
+    'Count_in_RIM',
+]
+
+
+def clean_text_column(values: pd.Series) -> pd.Series:
+    """Convert a column to stripped strings, with missing values as empty strings."""
+    return values.fillna("").astype(str).str.strip()
+
+
+def load_mvs_data(mvs_file: pathlib.Path) -> pd.DataFrame:
+    """Load the MVS columns used by the analysis."""
     print(f"Reading MVS file: {mvs_file}")
 
-    df = pd.read_csv(mvs_file, encoding='utf-8')
+    header = stage_output_columns(mvs_file)
 
-    # Column names
-    unique_id_col = 'Unique ID'
-    out_of_scope_col = 'Is the line Out Of Scope of the migration? = no active license or not owned by AGI anymore (divested)'
-    green_light_col = 'Green light for change to be implemented at site- by REG\nYES/NO'
-    molecule_col = 'Molecule'
-    implementation_rules_col = 'Implementation Rules'
-    validation_date_col = 'Validation date for Green light for change to be implemented at site- by REG'
-
-    if unique_id_col not in df.columns:
+    if MVS_UNIQUE_ID_COL not in header:
         print("ERROR: 'Unique ID' column not found in MVS file")
         sys.exit(1)
 
-    if out_of_scope_col not in df.columns:
+    if MVS_OUT_OF_SCOPE_COL not in header:
         print("ERROR: Out of Scope column not found in MVS file")
         sys.exit(1)
 
-    if green_light_col not in df.columns:
+    if MVS_GREEN_LIGHT_COL not in header:
         print("ERROR: Green light column not found in MVS file")
         sys.exit(1)
 
-    if molecule_col not in df.columns:
+    if MVS_MOLECULE_COL not in header:
         print("ERROR: 'Molecule' column not found in MVS file")
         sys.exit(1)
 
-    print(f"  Analyzing {len(df)} MVS rows against {len(rim_ids)} RIM IDs")
-
+    # Only read the columns the analysis needs (from the columnar copy of script 01 if available)
+    columns = [MVS_UNIQUE_ID_COL, MVS_OUT_OF_SCOPE_COL, MVS_GREEN_LIGHT_COL, MVS_MOLECULE_COL,
+               MVS_IMPLEMENTATION_RULES_COL, MVS_VALIDATION_DATE_COL]
+    return mask_csv_missing(read_stage_output(mvs_file, [col for col in columns if col in header]))
 
 
-    results = []
-
+def aggregate_mvs_data(df: pd.DataFrame, lookups: Dict[str, Dict]) -> pd.DataFrame:
+    """Group MVS rows by Unique ID and join the RIM and loader lookups onto each ID."""
     # Group by Unique ID to count occurrences and capture additional columns
     agg_dict = {
-        out_of_scope_col: 'first',  # Take first occurrence of Out of Scope value
-        green_light_col: 'first',   # Take first occurrence of Green light value
-        molecule_col: 'first',      # Take first occurrence of Molecule value
-        unique_id_col: 'count'      # Count occurrences
+        MVS_OUT_OF_SCOPE_COL: 'first',  # Take first occurrence of Out of Scope value
+        MVS_GREEN_LIGHT_COL: 'first',   # Take first occurrence of Green light value
+        MVS_MOLECULE_COL: 'first',      # Take first occurrence of Molecule value
+        MVS_UNIQUE_ID_COL: 'count'      # Count occurrences
     }
     
     # Add new columns if they exist
-    if implementation_rules_col in df.columns:
-        agg_dict[implementation_rules_col] = 'first'
-    if validation_date_col in df.columns:
-        agg_dict[validation_date_col] = 'first'
+    if MVS_IMPLEMENTATION_RULES_COL in df.columns:
+        agg_dict[MVS_IMPLEMENTATION_RULES_COL] = 'first'
+    if MVS_VALIDATION_DATE_COL in df.columns:
+        agg_dict[MVS_VALIDATION_DATE_COL] = 'first'
     
-    mvs_grouped = df.groupby(unique_id_col).agg(agg_dict).rename(columns={unique_id_col: 'count'})
-
-    for mvs_id, row in mvs_grouped.iterrows():
-        if pd.notna(mvs_id) and str(mvs_id).strip():
-            mvs_id_str = str(mvs_id).strip()
-
-            # Get Out of Scope value first to filter
-            out_of_scope_value = row[out_of_scope_col]
-            if pd.isna(out_of_scope_value):
-                out_of_scope_value = ""
-
-            out_of_scope_str = str(out_of_scope_value).strip()
-
-
-
-            # Get count of this MVS ID in RIM set
-            count_in_rim = rim_ids.get(mvs_id_str, 0)
-
-            # Get count of this MVS ID in RO Loader files
-            count_in_create = create_ids.get(mvs_id_str, 0)
-            count_in_update = update_ids.get(mvs_id_str, 0)
-
-            # Get greenlight values for this MVS ID
-            greenlight_create = create_greenlight.get(mvs_id_str, "")
-            greenlight_update = update_greenlight.get(mvs_id_str, "")
-            greenlight_rim = rim_greenlight.get(mvs_id_str, "")
-
-            # Get RIM product family for this MVS ID
-            rim_product_family_value = rim_product_family.get(mvs_id_str, "")
-            
-            # Get new RIM fields for this MVS ID
-            rim_greenlight_date_value = rim_greenlight_date.get(mvs_id_str, "")
-            rim_additional_info_value = rim_additional_info.get(mvs_id_str, "")
-            rim_record_id_value = rim_record_id.get(mvs_id_str, "")
-
-
-
-            # Get Green light value
-            green_light_value = row[green_light_col]
-            if pd.isna(green_light_value):
-                green_light_value = ""
-
-            # Get Molecule value
-            molecule_value = row[molecule_col]
-            if pd.isna(molecule_value):
-                molecule_value = ""
-            
-            # Get new MVS columns if they exist
-            implementation_rules_value = ""
-            if implementation_rules_col in row.index:
-                implementation_rules_value = row[implementation_rules_col]
-                if pd.isna(implementation_rules_value):
-                    implementation_rules_value = ""
-            
-            validation_date_value = ""
-            if validation_date_col in row.index:
-                validation_date_value = row[validation_date_col]
-                if pd.isna(validation_date_value):
-                    validation_date_value = ""
-
-            results.append({
-                'MVS_Unique_ID': mvs_id_str,
-                'Out_of_Scope': out_of_scope_str,
-                'Count_in_MVS': int(row['count']),
-                'Count_in_RO_Loader_Create': count_in_create,
-                'Count_in_RO_Loader_Update': count_in_update,
-                'Count_in_RIM': count_in_rim,
-                'Found_in_RIM': 'Yes' if count_in_rim > 0 else 'No',
-                'Green_Light_MVS': str(green_light_value).strip(),
-                'MVS_Implementation_Rules': str(implementation_rules_value).strip(),
-                'MVS_Validation_Date': str(validation_date_value).strip(),
-                'Greenlight_RO_Loader_Create': greenlight_create,
-                'Greenlight_RO_Loader_Update': greenlight_update,
-                'Greenlight_RIM': greenlight_rim,
-                'RIM_Date_of_Greenlight': str(rim_greenlight_date_value).strip(),
-                'RIM_Additional_Implementation_Info': str(rim_additional_info_value).strip(),
-                'RIM_Record_ID': str(rim_record_id_value).strip(),
-                'MVS_Molecule': str(molecule_value).strip(),
-                'RIM_Product_Family': str(rim_product_family_value).strip(),
-                'RIM_Product_Name': ""  # Will be populated by merge_product_family_data
-            })
-
-    return sorted(results, key=lambda x: x['MVS_Unique_ID'])
-
-def merge_product_family_data(results: List[Dict], product_df: pd.DataFrame) -> List[Dict]:
+    mvs_grouped = df.groupby(MVS_UNIQUE_ID_COL).agg(agg_dict).rename(columns={MVS_UNIQUE_ID_COL: 'count'})
+
+    # Skip blank IDs and key everything on the stripped ID
+    mvs_ids = pd.Series(mvs_grouped.index, index=mvs_grouped.index).astype(str).str.strip()
+    mvs_grouped = mvs_grouped[(mvs_ids != "").to_numpy()]
+    mvs_ids = mvs_ids[mvs_ids != ""].reset_index(drop=True)
+    mvs_grouped = mvs_grouped.reset_index(drop=True)
+
+    def optional_column(column: str) -> pd.Series:
+        if column in mvs_grouped.columns:
+            return clean_text_column(mvs_grouped[column])
+        return pd.Series("", index=mvs_grouped.index)
+
+    def lookup_count(name: str) -> pd.Series:
+        return mvs_ids.map(lookups[name]).fillna(0).astype('int64')
+
+    def lookup_text(name: str) -> pd.Series:
+        return clean_text_column(mvs_ids.map(lookups[name]))
+
+    count_in_rim = lookup_count('rim_ids')
+
+    results = pd.DataFrame({
+        'MVS_Unique_ID': mvs_ids,
+        'Out_of_Scope': clean_text_column(mvs_grouped[MVS_OUT_OF_SCOPE_COL]),
+        # Classify each distinct Out of Scope spelling once and broadcast to every ID
+        IN_SCOPE_COLUMN: classify_in_scope(mvs_grouped[MVS_OUT_OF_SCOPE_COL]),
+        'Count_in_MVS': mvs_grouped['count'].astype('int64'),
+        'Count_in_RO_Loader_Create': lookup_count('create_ids'),
+        'Count_in_RO_Loader_Update': lookup_count('update_ids'),
+        'Count_in_RIM': count_in_rim,
+        'Found_in_RIM': count_in_rim.gt(0).map({True: 'Yes', False: 'No'}),
+        'Green_Light_MVS': clean_text_column(mvs_grouped[MVS_GREEN_LIGHT_COL]),
+        'MVS_Implementation_Rules': optional_column(MVS_IMPLEMENTATION_RULES_COL),
+        'MVS_Validation_Date': optional_column(MVS_VALIDATION_DATE_COL),
+        'Greenlight_RO_Loader_Create': lookup_text('create_greenlight'),
+        'Greenlight_RO_Loader_Update': lookup_text('update_greenlight'),
+        'Greenlight_RIM': lookup_text('rim_greenlight'),
+        'RIM_Date_of_Greenlight': lookup_text('rim_greenlight_date'),
+        'RIM_Additional_Implementation_Info': lookup_text('rim_additional_info'),
+        'RIM_Record_ID': lookup_text('rim_record_id'),
+        'MVS_Molecule': clean_text_column(mvs_grouped[MVS_MOLECULE_COL]),
+        'RIM_Product_Family': lookup_text('rim_product_family'),
+        'RIM_Product_Name': ""  # Will be populated by merge_product_family_data
+    })
+
+    return results.sort_values('MVS_Unique_ID', kind='stable', ignore_index=True)
+
+
+def hash_buckets(keys: np.ndarray, buckets: int) -> np.ndarray:
+    """Assign each ID to a bucket. Stable across processes, unlike Python's salted hash()."""
+    return (pd.util.hash_array(keys.astype(object)) % np.uint64(buckets)).astype(np.int64)
+
+
+def partition_mvs_rows(df: pd.DataFrame, buckets: int) -> List[pd.DataFrame]:
+    """Split MVS rows into buckets by stripped Unique ID, so every ID group stays in one bucket."""
+    keys = df[MVS_UNIQUE_ID_COL].astype(str).str.strip().to_numpy(dtype=object)
+    bucket_of_row = hash_buckets(keys, buckets)
+    return [df[bucket_of_row == bucket] for bucket in range(buckets)]
+
+
+def partition_lookups(lookups: Dict[str, Dict], buckets: int) -> List[Dict[str, Dict]]:
+    """Split every lookup table into buckets using the same ID hash as the MVS rows."""
+    partitions = [{name: {} for name in lookups} for _ in range(buckets)]
+
+    for name, values in lookups.items():
+        if not values:
+            continue
+        keys = np.array(list(values), dtype=object)
+        for key, bucket in zip(keys, hash_buckets(keys, buckets)):
+            partitions[bucket][name][key] = values[key]
+
+    return partitions
+
+
+def aggregate_mvs_data_parallel(df: pd.DataFrame, lookups: Dict[str, Dict], workers: int) -> pd.DataFrame:
+    """Hash-partition MVS rows and lookups by Unique ID and aggregate each bucket in its own process."""
+    mvs_partitions = partition_mvs_rows(df, workers)
+    lookup_partitions = partition_lookups(lookups, workers)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        bucket_results = list(executor.map(aggregate_mvs_data, mvs_partitions, lookup_partitions))
+
+    for bucket, bucket_result in enumerate(bucket_results):
+        print(f"    Bucket {bucket}: {len(mvs_partitions[bucket])} MVS rows -> {len(bucket_result)} IDs")
+
+    # Equal IDs always share a bucket, so a stable sort reproduces the single-process order
+    non_empty = [bucket_result for bucket_result in bucket_results if len(bucket_result)] or bucket_results[:1]
+    results = pd.concat(non_empty, ignore_index=True)
+    return results.sort_values('MVS_Unique_ID', kind='stable', ignore_index=True)
+
+
+def analyze_mvs_data(mvs_file: pathlib.Path, lookups: Dict[str, Dict], workers: int = 1) -> pd.DataFrame:
+    """Analyze MVS data to show which MVS IDs are found in RIM set."""
+    df = load_mvs_data(mvs_file)
+
+    print(f"  Analyzing {len(df)} MVS rows against {len(lookups['rim_ids'])} RIM IDs")
+
+    if workers <= 1:
+        return aggregate_mvs_data(df, lookups)
+
+    print(f"  Partitioning into {workers} buckets by Unique ID hash...")
+    return aggregate_mvs_data_parallel(df, lookups, workers)
+
+def merge_product_family_data(results: pd.DataFrame, product_df: pd.DataFrame) -> pd.DataFrame:
     """Merge product family data with the results."""
     print("Merging product family data...")
 
-    # Create a lookup dictionary for product names
-    product_lookup = {}
-    for _, row in product_df.iterrows():
-        if pd.notna(row['id']) and pd.notna(row['name__v']):
-            product_lookup[str(row['id']).strip()] = str(row['name__v']).strip()
+    # Create a lookup series for product names
+    products = product_df.dropna(subset=['id', 'name__v'])
+    product_lookup = pd.Series(
+        clean_text_column(products['name__v']).to_numpy(),
+        index=clean_text_column(products['id']).to_numpy()
+    )
+    # Keep the last name per ID, as the previous dict-based lookup did
+    product_lookup = product_lookup[~product_lookup.index.duplicated(keep='last')]
 
     # Update results with product names and remove the ID column
-    for result in results:
-        rim_product_family_id = result.pop('RIM_Product_Family', "")  # Remove the ID column
-        if rim_product_family_id:
-            product_name = product_lookup.get(rim_product_family_id, "")
-            result['RIM_Product_Name'] = product_name
-        else:
-            result['RIM_Product_Name'] = ""
+    results['RIM_Product_Name'] = clean_text_column(results['RIM_Product_Family'].map(product_lookup))
+    results = results.drop(columns=['RIM_Product_Family'])
 
     print(f"  Merged product family data for {len(results)} records")
     return results
 
 
+# Greenlight columns compared by the consistency stage, with their short source labels
+GREENLIGHT_SOURCES = {
+    'Green_Light_MVS': 'MVS',
+    'Greenlight_RO_Loader_Create': 'Create',
+    'Greenlight_RO_Loader_Update': 'Update',
+    'Greenlight_RIM': 'RIM',
+}
+
+# Normalised greenlight states (the position is the integer code used in the combination table)
+GREENLIGHT_STATES = ['BLANK', 'YES', 'NO', 'OTHER']
+
+GREENLIGHT_BLANK_VALUES = {'', 'nan', 'none', 'null', 'n/a', 'na', '-'}
+GREENLIGHT_YES_PATTERN = re.compile(r"^(yes|y|true|1)\b")
+GREENLIGHT_NO_PATTERN = re.compile(r"^(no|n|false|0)\b")
+
+
+def normalize_greenlight_value(value) -> str:
+    """Normalise one raw greenlight value to YES, NO, BLANK or OTHER."""
+    if pd.isna(value):
+        return 'BLANK'
+
+    text = str(value).strip().lower()
+    if text in GREENLIGHT_BLANK_VALUES:
+        return 'BLANK'
+    if GREENLIGHT_YES_PATTERN.match(text):
+        return 'YES'
+    if GREENLIGHT_NO_PATTERN.match(text):
+        return 'NO'
+    return 'OTHER'
+
+
+def normalize_greenlight(values: pd.Series) -> np.ndarray:
+    """Normalise a greenlight column to state codes, evaluating each distinct value once."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    states = [GREENLIGHT_STATES.index(normalize_greenlight_value(value)) for value in uniques]
+    # Append BLANK so the NA sentinel (-1) maps to a blank state
+    lookup = np.array(states + [GREENLIGHT_STATES.index('BLANK')], dtype=np.int8)
+    return lookup[codes]
+
+
+def greenlight_consistency_label(states: tuple) -> str:
+    """Build the consistency category for one combination of source states."""
+    present = [(label, state) for label, state in zip(GREENLIGHT_SOURCES.values(), states) if state != 'BLANK']
+
+    if not present:
+        return 'No greenlight data'
+    if len({state for _, state in present}) == 1:
+        return f"Consistent {present[0][1]}"
+
+    # e.g. "MVS YES, RIM NO"
+    return ", ".join(f"{label} {state}" for label, state in present)
+
+
+def analyze_greenlight_consistency(results: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Classify every ID into a greenlight consistency category across MVS, loaders and RIM."""
+    print("Analyzing greenlight consistency...")
+
+    n_states = len(GREENLIGHT_STATES)
+    source_columns = list(GREENLIGHT_SOURCES)
+
+    # Every possible combination of source states gets its label up front
+    combinations = list(itertools.product(GREENLIGHT_STATES, repeat=len(source_columns)))
+    combination_labels = np.array([greenlight_consistency_label(states) for states in combinations], dtype=object)
+
+    # Encode each ID's states as one base-n combination code in a single vectorised pass
+    state_codes = {column: normalize_greenlight(results[column]) for column in source_columns}
+    combination_code = np.zeros(len(results), dtype=np.int64)
+    for column in source_columns:
+        combination_code = combination_code * n_states + state_codes[column]
+
+    results = results.copy()
+    results['Greenlight_Consistency'] = combination_labels[combination_code]
+
+    # Per-category count matrix over the normalised states
+    state_frame = pd.DataFrame({
+        GREENLIGHT_SOURCES[column]: pd.Categorical.from_codes(state_codes[column], GREENLIGHT_STATES)
+        for column in source_columns
+    })
+    state_frame['Greenlight_Consistency'] = results['Greenlight_Consistency'].to_numpy()
+    state_frame['In_Scope_IDs'] = results[IN_SCOPE_COLUMN].to_numpy()
+    matrix = (
+        state_frame.groupby(list(GREENLIGHT_SOURCES.values()) + ['Greenlight_Consistency'], observed=True)
+        .agg(IDs=('In_Scope_IDs', 'size'), In_Scope_IDs=('In_Scope_IDs', 'sum'))
+        .reset_index()
+        .sort_values(['IDs', 'Greenlight_Consistency'], ascending=[False, True], kind='stable', ignore_index=True)
+    )
+
+    # Long-format table: one row per source for every inconsistent ID
+    is_mismatch = ~results['Greenlight_Consistency'].str.startswith('Consistent') & \
+        (results['Greenlight_Consistency'] != 'No greenlight data')
+    mismatched = results[is_mismatch.to_numpy()]
+    mismatches = pd.concat([
+        pd.DataFrame({
+            'MVS_Unique_ID': mismatched['MVS_Unique_ID'],
+            IN_SCOPE_COLUMN: mismatched[IN_SCOPE_COLUMN],
+            'Greenlight_Consistency': mismatched['Greenlight_Consistency'],
+            'Source': GREENLIGHT_SOURCES[column],
+            'Raw_Value': mismatched[column],
+            'Normalized_Value': pd.Categorical.from_codes(state_codes[column][is_mismatch.to_numpy()], GREENLIGHT_STATES),
+        })
+        for column in source_columns
+    ])
+    # Results are already sorted by ID, so restoring row order groups each ID's sources together
+    mismatches = mismatches.sort_index(kind='stable').reset_index(drop=True)
+
+    print(f"  Consistent IDs: {int(results['Greenlight_Consistency'].str.startswith('Consistent').sum())}")
+    print(f"  Inconsistent IDs: {int(is_mismatch.sum())}")
+    print(f"  Mismatch categories: {mismatches['Greenlight_Consistency'].nunique()}")
+    return results, matrix, mismatches
+
+
+# Date formats tried in order when parsing greenlight dates (MVS is DD-MM-YYYY free text, RIM is ISO)
+GREENLIGHT_DATE_FORMATS = [
+    '%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y',
+    '%d-%m-%y', '%d/%m/%y', '%d.%m.%y',
+    '%Y-%m-%d', '%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%d %H:%M:%S',
+    '%d %b %Y', '%d-%b-%Y', '%d %B %Y', '%d-%b-%y',
+]
+
+# Date-like token inside free text, e.g. "validated 01-02-2025 by REG"
+DATE_TOKEN_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ][\d:.]+Z?)?|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}")
+
+
+def _parse_with_formats(text: str) -> Optional[datetime.date]:
+    """Parse text with the first matching greenlight date format."""
+    for date_format in GREENLIGHT_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
 
+@lru_cache(maxsize=None)
+def parse_greenlight_date(text: str) -> Optional[datetime.date]:
+    """Parse one distinct greenlight date string, inferring its format. Cached per string."""
+    text = text.strip()
+    if not text:
+        return None
 
+    parsed = _parse_with_formats(text)
+    if parsed is not None:
+        return parsed
 
-def export_results(results: List[Dict], output_file: pathlib.Path):
-    """Export results to CSV file with file lock handling."""
-    print(f"Exporting results to: {output_file}")
+    # Fall back to the first date-like token in free text
+    token = DATE_TOKEN_PATTERN.search(text)
+    if token:
+        return _parse_with_formats(token.group(0))
+
+    return None
 
-    results_df = pd.DataFrame(results)
 
-    # Handle file lock with retry mechanism
+def parse_greenlight_dates(values: pd.Series) -> tuple[pd.Series, pd.DataFrame]:
+    """Parse a date column once per distinct value. Returns the dates and the unparseable values with counts."""
+    codes, uniques = pd.factorize(values.fillna("").astype(str).str.strip())
+    parsed = [parse_greenlight_date(value) for value in uniques]
+
+    # Broadcast the parsed distinct values back to every row
+    lookup = pd.to_datetime(pd.Series(parsed, dtype=object)).to_numpy()
+    dates = pd.Series(lookup[codes], index=values.index)
+
+    counts = np.bincount(codes, minlength=len(uniques))
+    failed = [(value, int(count)) for value, date, count in zip(uniques, parsed, counts) if value and date is None]
+    unparseable = pd.DataFrame({
+        'Value': pd.Series([value for value, _ in failed], dtype=object),
+        'Count': pd.Series([count for _, count in failed], dtype='int64'),
+    })
+    return dates, unparseable
+
+
+def reconcile_greenlight_dates(results: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Compare the MVS validation date with the RIM date of greenlight."""
+    print("Reconciling greenlight dates...")
+
+    mvs_dates, mvs_unparseable = parse_greenlight_dates(results['MVS_Validation_Date'])
+    rim_dates, rim_unparseable = parse_greenlight_dates(results['RIM_Date_of_Greenlight'])
+
+    # Day difference is RIM minus MVS; blank when either side is missing or unparseable
+    day_difference = (rim_dates - mvs_dates).dt.days.astype('Int64')
+
+    results = results.copy()
+    results['Greenlight_Date_Diff_Days'] = day_difference
+    results['Greenlight_Date_Mismatch'] = np.where(
+        day_difference.isna(), "", np.where(day_difference.fillna(0) != 0, 'Yes', 'No')
+    )
+
+    unparseable = pd.concat([
+        mvs_unparseable.assign(Column='MVS_Validation_Date'),
+        rim_unparseable.assign(Column='RIM_Date_of_Greenlight'),
+    ], ignore_index=True)[['Column', 'Value', 'Count']]
+    unparseable = unparseable.sort_values(['Column', 'Count', 'Value'], ascending=[True, False, True], ignore_index=True)
+
+    print(f"  Distinct date strings parsed: {parse_greenlight_date.cache_info().currsize}")
+    print(f"  Dates compared: {int(day_difference.notna().sum())}")
+    print(f"  Date mismatches: {int((results['Greenlight_Date_Mismatch'] == 'Yes').sum())}")
+    for column, values in unparseable.groupby('Column', sort=True):
+        print(f"  Unparseable {column}: {len(values)} distinct values, {int(values['Count'].sum())} IDs")
+        for _, row in values.head(5).iterrows():
+            print(f"    '{row['Value']}': {row['Count']}")
+
+    return results, unparseable
+
+
+def compact_results(results: pd.DataFrame) -> pd.DataFrame:
+    """Dictionary-encode low-cardinality text columns and downcast the counts."""
+    results = results.copy()
+    for column in CATEGORICAL_COLUMNS:
+        results[column] = results[column].astype('category')
+    for column in COUNT_COLUMNS:
+        results[column] = results[column].astype('int32')
+
+    memory_mb = results.memory_usage(deep=True).sum() / (1024 * 1024)
+    print(f"  Result table: {len(results)} rows, {memory_mb:.1f} MB in memory")
+    return results
+
+
+def write_csv_with_retry(df: pd.DataFrame, output_file: pathlib.Path):
+    """Write CSV with file lock handling and retry mechanism."""
+    attempt = 0
     while True:
         try:
-            results_df.to_csv(output_file, index=False, encoding='utf-8')
+            df.to_csv(output_file, index=False, encoding='utf-8')
             break
         except PermissionError:
             print(f"ERROR: File is locked: {output_file}")
-            print("Please close the file in Excel and press Enter to retry...")
-            input("Press Enter when ready: ")
+            attempt += 1
+            wait_for_unlock(output_file, attempt)
             continue
         except Exception:
             print(f"ERROR: Could not write file: {output_file}")
             sys.exit(1)
 
+
+def export_date_reconciliation(unparseable: pd.DataFrame, unparseable_file: pathlib.Path):
+    """Export unparseable greenlight date values with their counts."""
+    print(f"Exporting unparseable greenlight dates to: {unparseable_file}")
+    write_in_background(unparseable_file, write_csv_with_retry, unparseable, unparseable_file,
+                        success_message=f"  SUCCESS: Exported {len(unparseable)} unparseable values")
+
+
+def export_results(results: pd.DataFrame, output_file: pathlib.Path):
+    """Export results to CSV file with file lock handling, plus a typed columnar copy."""
+    print(f"Exporting results to: {output_file}")
+
+    # Script 04 takes the table straight from memory when both run in one process
+    publish_dataset(output_file, results)
+    write_in_background(output_file, write_csv_with_retry, results, output_file,
+                        success_message=f"  SUCCESS: Exported {len(results)} MVS Unique IDs")
+
+    # Typed columnar copy keeps the categorical encoding for scripts 04 and analyze_*
+    write_in_background(output_file, write_columnar, results, output_file)
+
     # Summary statistics
-    found_count = len([r for r in results if r['Found_in_RIM'] == 'Yes'])
-    not_found_count = len([r for r in results if r['Found_in_RIM'] == 'No'])
-    total_mvs_entries = sum(r['Count_in_MVS'] for r in results)
+    found_count = int((results['Found_in_RIM'] == 'Yes').sum())
+    not_found_count = int((results['Found_in_RIM'] == 'No').sum())
+    total_mvs_entries = int(results['Count_in_MVS'].sum())
 
-    print(f"  SUCCESS: Exported {len(results)} MVS Unique IDs")
     print(f"  Found in RIM: {found_count}")
     print(f"  Not found in RIM: {not_found_count}")
     print(f"  Total MVS entries: {total_mvs_entries}")
 
 
+def export_greenlight_consistency(matrix: pd.DataFrame, mismatches: pd.DataFrame,
+                                  matrix_file: pathlib.Path, mismatch_file: pathlib.Path):
+    """Export the greenlight consistency count matrix and long-format mismatch table."""
+    print(f"Exporting greenlight consistency matrix to: {matrix_file}")
+    write_in_background(matrix_file, write_csv_with_retry, matrix, matrix_file,
+                        success_message=f"  SUCCESS: Exported {len(matrix)} state combinations")
+
+    print(f"Exporting greenlight mismatches to: {mismatch_file}")
+    write_in_background(mismatch_file, write_csv_with_retry, mismatches, mismatch_file,
+                        success_message=f"  SUCCESS: Exported {len(mismatches)} mismatch rows")
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Compare MVS Unique IDs with RO loaders and RIM")
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="Number of worker processes for the hash-partitioned MVS aggregation (default: 1)"
+    )
+    return parser.parse_args()
+
+
 def main():
     """Main execution function."""
+    args = parse_arguments()
+
     print("=" * 70)
     print("MIG RIM IDs FOUND IN MVS ANALYSIS")
     print("=" * 70)
@@ -623,6 +896,9 @@ def main():
     loader_update_file = pathlib.Path("02 Loader sheets/regulatory_objective_rim_update.csv")
     product_file = pathlib.Path("03 Target RIM/product__v.csv")
     output_file = pathlib.Path("03 - Compare Unique IDs and Green Light.csv")
+    matrix_file = pathlib.Path("03 - Greenlight Consistency Matrix.csv")
+    mismatch_file = pathlib.Path("03 - Greenlight Mismatches.csv")
+    unparseable_dates_file = pathlib.Path("03 - Greenlight Date Unparseable.csv")
 
     # Validate input files
     if not rim_file.exists():
@@ -656,18 +932,43 @@ def main():
     product_df = load_product_data(product_file)
 
     # Analyze MVS data
-    results = analyze_mvs_data(mvs_file, rim_ids, create_ids, update_ids, create_greenlight, update_greenlight, 
-                               rim_greenlight, rim_product_family, rim_greenlight_date, rim_additional_info, rim_record_id)
+    lookups = {
+        'rim_ids': rim_ids,
+        'create_ids': create_ids,
+        'update_ids': update_ids,
+        'create_greenlight': create_greenlight,
+        'update_greenlight': update_greenlight,
+        'rim_greenlight': rim_greenlight,
+        'rim_product_family': rim_product_family,
+        'rim_greenlight_date': rim_greenlight_date,
+        'rim_additional_info': rim_additional_info,
+        'rim_record_id': rim_record_id,
+    }
+    results = analyze_mvs_data(mvs_file, lookups, workers=args.workers)
 
     # Merge product family data
     results = merge_product_family_data(results, product_df)
 
+    # Compare greenlight values across MVS, loaders and RIM
+    results, greenlight_matrix, greenlight_mismatches = analyze_greenlight_consistency(results)
+
+    # Compare MVS validation dates with RIM greenlight dates
+    results, unparseable_dates = reconcile_greenlight_dates(results)
+
+    # Dictionary-encode the result table
+    results = compact_results(results)
+
     # Export results
     export_results(results, output_file)
+    export_greenlight_consistency(greenlight_matrix, greenlight_mismatches, matrix_file, mismatch_file)
+    export_date_reconciliation(unparseable_dates, unparseable_dates_file)
 
     print("\n" + "=" * 70)
     print("ANALYSIS COMPLETED SUCCESSFULLY")
     print(f"Output file: {output_file}")
+    print(f"Greenlight matrix: {matrix_file}")
+    print(f"Greenlight mismatches: {mismatch_file}")
+    print(f"Unparseable greenlight dates: {unparseable_dates_file}")
     print("=" * 70)
 
 
@@ -8,20 +8,68 @@ Success Criteria: Generate CSV with product match TRUE/FALSE/empty based on mole
 Logic: Case-insensitive matching, all RIM molecules must be found in MVS for TRUE result
 """
 
+import argparse
+import hashlib
+import inspect
+import numpy as np
 import pandas as pd
 import pathlib
 import sys
 import re
-from typing import List, Set
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import molecule_matching
+from columnar_io import read_stage_output, stage_output_exists, write_columnar
+from dataset_registry import wait_for_unlock, write_in_background
+from molecule_matching import MoleculeMatcher
+from molecule_normalization import MoleculeNormalizer, default_normalizer, load_normalizer
+from verdict_cache import VERDICT_CACHE_FILE, VerdictCache, normalize_pair_key
 
+try:
+    from rapidfuzz import fuzz, process as rapidfuzz_process, utils as rapidfuzz_utils
+except ImportError:
+    fuzz = None  # Only needed for --fuzzy
 
-def parse_rim_product_molecules(rim_product_name: str) -> List[str]:
+
+# Bounded LRU size for the molecule parsers (distinct strings are few compared to rows)
+PARSE_CACHE_SIZE = 65536
+
+# Rows formatted per chunk when writing the output CSV
+CSV_CHUNK_ROWS = 250_000
+
+# Bump when the matching rules change in a way the source hash below would not catch
+MATCH_RULES_VERSION = "1"
+
+# Distinct pairs per task in parallel mode
+PAIR_CHUNK_SIZE = 20_000
+
+# Parenthetical content in RIM product names, e.g. "testosterone (decanoate, propionate)"
+PARENTHESES_CONTENT_PATTERN = re.compile(r'\((.*?)\)')
+PARENTHESES_PATTERN = re.compile(r'\s*\([^)]*\)')
+
+# Compiled index of known RIM molecules, set by configure_molecule_matcher()
+MOLECULE_MATCHER: Optional[MoleculeMatcher] = None
+
+# Fuzzy mode: catalog blocking on the first letters of each word, scored in query batches
+FUZZY_TOKEN_PATTERN = re.compile(r'[a-z]{3,}')
+FUZZY_BLOCK_PREFIX_LENGTH = 4
+FUZZY_BATCH_SIZE = 2048
+
+# Synonym and salt tables, replaced with the LoV workbook tables by configure_normalizer()
+MOLECULE_NORMALIZER: MoleculeNormalizer = default_normalizer()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_rim_product_molecules(rim_product_name: str) -> Tuple[str, ...]:
     """
     Parse RIM product name to extract individual molecule names.
     Handles comma-separated molecules and parenthetical content.
+    Cached per product name, so the result is returned as an immutable tuple.
     """
     if pd.isna(rim_product_name) or not str(rim_product_name).strip():
-        return []
+        return ()
     
     product_name = str(rim_product_name).strip().lower()
     
@@ -36,7 +84,7 @@ def parse_rim_product_molecules(rim_product_name: str) -> List[str]:
         # but keep the molecules inside parentheses as separate molecules
         if '(' in part and ')' in part:
             # Extract content inside parentheses
-            paren_content = re.findall(r'\((.*?)\)', part)
+            paren_content = PARENTHESES_CONTENT_PATTERN.findall(part)
             if paren_content:
                 # Add molecules from inside parentheses
                 paren_molecules = paren_content[0].split(',')
@@ -46,7 +94,7 @@ def parse_rim_product_molecules(rim_product_name: str) -> List[str]:
                         molecules.append(paren_mol)
             
             # Remove parentheses and add the main molecule
-            main_part = re.sub(r'\s*\([^)]*\)', '', part).strip()
+            main_part = PARENTHESES_PATTERN.sub('', part).strip()
             if main_part:
                 molecules.append(main_part)
         else:
@@ -62,43 +110,25 @@ def parse_rim_product_molecules(rim_product_name: str) -> List[str]:
             normalized = normalize_molecule_name(mol)
             cleaned_molecules.append(normalized)
 
-    return cleaned_molecules
+    return tuple(cleaned_molecules)
 
 
 def normalize_molecule_name(molecule: str) -> str:
     """
     Normalize molecule name for better matching.
-    Handles common spelling variations and standardizations.
+    Handles spelling variations from the LoV mapping and the built-in standardizations.
     """
-    if not molecule:
-        return ""
-
-    molecule = molecule.lower().strip()
-
-    # Handle common spelling variations
-    spelling_variations = {
-        'indometacin': 'indomethacin',
-        'tioguanine': 'thioguanine',
-        'sulfamethoxazole': 'sulphamethoxazole',
-    }
-
-    for variant, standard in spelling_variations.items():
-        if molecule == variant:
-            molecule = standard
-        elif molecule == standard:
-            # Also check reverse mapping
-            pass
+    return MOLECULE_NORMALIZER.normalize(molecule)
 
-    return molecule
 
-
-def extract_mvs_molecules(mvs_molecule: str) -> Set[str]:
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def extract_mvs_molecules(mvs_molecule: str) -> FrozenSet[str]:
     """
     Extract and normalize molecules from MVS molecule string.
-    Returns a set of lowercase molecule names for matching.
+    Returns a frozen set of lowercase molecule names for matching (cached per MVS string).
     """
     if pd.isna(mvs_molecule) or not str(mvs_molecule).strip():
-        return set()
+        return frozenset()
 
     molecule_str = str(mvs_molecule).strip().lower()
 
@@ -119,7 +149,7 @@ def extract_mvs_molecules(mvs_molecule: str) -> Set[str]:
         part = part.strip()
 
         # Remove common suffixes/prefixes
-        part = re.sub(r'\s+(hydrochloride|hcl|sodium|acetate|phosphate|base|hydrobromide|calcium|decanoate)$', '', part)
+        part = MOLECULE_NORMALIZER.strip_salt(part)
         part = part.strip()
 
         if part:
@@ -127,7 +157,7 @@ def extract_mvs_molecules(mvs_molecule: str) -> Set[str]:
             normalized = normalize_molecule_name(part)
             molecules.add(normalized)
 
-    return molecules
+    return frozenset(molecules)
 
 
 def check_product_match(mvs_molecule: str, rim_product_name: str) -> str:
@@ -175,12 +205,11 @@ def check_product_match(mvs_molecule: str, rim_product_name: str) -> str:
             if has_testosterone:
                 continue  # Skip checking specific forms if base is present
 
-        # Check if this RIM molecule is found in any MVS molecule
-        found = False
-        for mvs_mol in mvs_molecules:
-            if rim_mol in mvs_mol or mvs_mol in rim_mol:
-                found = True
-                break
+        # Check if this RIM molecule is found in any MVS molecule (substring in either direction)
+        if MOLECULE_MATCHER is not None:
+            found = MOLECULE_MATCHER.matches(rim_mol, mvs_molecules)
+        else:
+            found = any(rim_mol in mvs_mol or mvs_mol in rim_mol for mvs_mol in mvs_molecules)
 
         if not found:
             return "FALSE"
@@ -188,20 +217,249 @@ def check_product_match(mvs_molecule: str, rim_product_name: str) -> str:
     return "TRUE"
 
 
-def process_product_comparison(input_file: pathlib.Path, output_file: pathlib.Path):
+def load_product_catalog(product_file: pathlib.Path) -> List[str]:
+    """Load the distinct product names from product__v."""
+    if not product_file.exists():
+        print(f"WARNING: Product file not found: {product_file}")
+        return []
+
+    print(f"Reading product catalog: {product_file}")
+    product_df = pd.read_csv(product_file, encoding='utf-8', usecols=['name__v'])
+    return list(pd.unique(product_df['name__v'].dropna().astype(str).str.strip()))
+
+
+def build_molecule_matcher(product_names: Iterable[str]) -> MoleculeMatcher:
+    """Compile every known RIM molecule (from the product catalog and input product names) into one matcher."""
+    molecules = set()
+    for name in pd.unique(pd.Series(list(product_names), dtype=object)):
+        molecules.update(parse_rim_product_molecules(name))
+
+    matcher = MoleculeMatcher(molecules)
+    print(f"  Compiled {len(matcher.molecules):,} RIM molecules into the matcher")
+    return matcher
+
+
+def configure_normalizer(normalizer: MoleculeNormalizer):
+    """Set the synonym and salt tables used by both molecule parsers."""
+    global MOLECULE_NORMALIZER
+    MOLECULE_NORMALIZER = normalizer
+    # Parsed molecules depend on the tables, so drop anything cached with the previous ones
+    parse_rim_product_molecules.cache_clear()
+    extract_mvs_molecules.cache_clear()
+
+
+def configure_molecule_matcher(matcher: Optional[MoleculeMatcher]):
+    """Set the molecule matcher used by check_product_match."""
+    global MOLECULE_MATCHER
+    MOLECULE_MATCHER = matcher
+
+
+def evaluate_pairs(pairs: List[Tuple[Optional[str], Optional[str]]]) -> List[str]:
+    """Run check_product_match for a list of (MVS_Molecule, RIM_Product_Name) pairs."""
+    return [check_product_match(mvs_molecule, rim_product_name) for mvs_molecule, rim_product_name in pairs]
+
+
+def _init_match_worker(normalizer: MoleculeNormalizer, matcher: Optional[MoleculeMatcher]):
+    """Process pool initializer: install the compiled normalisation tables and matcher once per worker."""
+    configure_normalizer(normalizer)
+    configure_molecule_matcher(matcher)
+
+
+def evaluate_pairs_parallel(pairs: List[Tuple[Optional[str], Optional[str]]], workers: int) -> List[str]:
+    """Split the pairs into chunks, evaluate them in a process pool and gather the verdicts in order."""
+    chunks = [pairs[start:start + PAIR_CHUNK_SIZE] for start in range(0, len(pairs), PAIR_CHUNK_SIZE)]
+    print(f"  Evaluating {len(chunks):,} chunks of up to {PAIR_CHUNK_SIZE:,} pairs on {workers} workers...")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_match_worker,
+                             initargs=(MOLECULE_NORMALIZER, MOLECULE_MATCHER)) as executor:
+        chunk_verdicts = list(executor.map(evaluate_pairs, chunks))
+
+    return [verdict for verdicts in chunk_verdicts for verdict in verdicts]
+
+
+def matching_rules_version() -> str:
+    """Hash of the matching code, its module-level patterns and the loaded normalisation tables, used to key cached verdicts."""
+    sources = [inspect.getsource(code) for code in (
+        check_product_match, parse_rim_product_molecules, extract_mvs_molecules, normalize_molecule_name,
+        MoleculeNormalizer, molecule_matching,
+    )]
+    # Module-level patterns are read by the functions above but are not part of their source
+    patterns = [repr((pattern.pattern, pattern.flags)) for pattern in (PARENTHESES_CONTENT_PATTERN, PARENTHESES_PATTERN)]
+    payload = "\n".join([MATCH_RULES_VERSION, MOLECULE_NORMALIZER.version] + patterns + sources)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def evaluate_distinct_pairs(pairs: List[Tuple[Optional[str], Optional[str]]], workers: int) -> Tuple[List[str], int]:
+    """Evaluate pairs in one process, or in a pool when there is more than one chunk. Returns verdicts and workers used."""
+    if workers > 1 and len(pairs) > PAIR_CHUNK_SIZE:
+        return evaluate_pairs_parallel(pairs, workers), workers
+    return evaluate_pairs(pairs), 1
+
+
+def match_distinct_pairs(df: pd.DataFrame, workers: int = 1, verdict_cache: Optional[VerdictCache] = None) -> pd.Series:
+    """Evaluate check_product_match once per distinct (MVS_Molecule, RIM_Product_Name) pair and broadcast it."""
+    # Encode every record's pair as one integer code (missing values get their own code)
+    mvs_codes, mvs_uniques = pd.factorize(df['MVS_Molecule'])
+    rim_codes, rim_uniques = pd.factorize(df['RIM_Product_Name'])
+    combined_codes = (mvs_codes.astype(np.int64) + 1) * (len(rim_uniques) + 1) + (rim_codes + 1)
+    pair_codes, pair_keys = pd.factorize(combined_codes)
+    print(f"  Distinct molecule/product pairs: {len(pair_keys):,} (from {len(df):,} records)")
+
+    pairs = []
+    for pair_key in pair_keys:
+        mvs_index, rim_index = divmod(int(pair_key), len(rim_uniques) + 1)
+        mvs_molecule = mvs_uniques[mvs_index - 1] if mvs_index else None
+        rim_product_name = rim_uniques[rim_index - 1] if rim_index else None
+        pairs.append((mvs_molecule, rim_product_name))
+
+    start = time.perf_counter()
+    if verdict_cache is None:
+        verdicts, workers = evaluate_distinct_pairs(pairs, workers)
+    else:
+        # Only pairs whose normalised key has no stored verdict are evaluated
+        cache_keys = [normalize_pair_key(mvs_molecule, rim_product_name) for mvs_molecule, rim_product_name in pairs]
+        known = verdict_cache.lookup(cache_keys)
+        pending = {}
+        for cache_key, pair in zip(cache_keys, pairs):
+            if cache_key not in known and cache_key not in pending:
+                pending[cache_key] = pair
+
+        new_verdicts, workers = evaluate_distinct_pairs(list(pending.values()), workers)
+        new_verdicts = dict(zip(pending, new_verdicts))
+        verdict_cache.store(new_verdicts)
+        known.update(new_verdicts)
+        verdicts = [known[cache_key] for cache_key in cache_keys]
+
+        lookups = verdict_cache.hits + verdict_cache.misses
+        hit_rate = verdict_cache.hits / lookups if lookups else 0.0
+        print(f"  Verdict cache: {verdict_cache.hits:,} hits / {verdict_cache.misses:,} misses ({hit_rate:.1%})")
+    elapsed = time.perf_counter() - start
+
+    # Deduplication ratio: each distinct pair is evaluated once for all its records
+    pair_ratio = len(pair_keys) / len(df) if len(df) else 0.0
+    throughput = len(pair_keys) / elapsed if elapsed else 0.0
+    print(f"  Evaluated {len(pair_keys):,} pairs for {len(df):,} records ({pair_ratio:.1%}) in {elapsed:.2f}s")
+    print(f"  Throughput: {throughput:,.0f} pairs/s with {workers} worker(s)")
+    if workers == 1:
+        for parser in (parse_rim_product_molecules, extract_mvs_molecules):
+            info = parser.cache_info()
+            lookups = info.hits + info.misses
+            hit_rate = info.hits / lookups if lookups else 0.0
+            print(f"  {parser.__name__} cache: {info.hits:,} hits / {lookups:,} lookups ({hit_rate:.1%})")
+
+    # Map verdicts back to every record through the pair codes
+    verdict_lookup = np.array(verdicts, dtype=object)
+    return pd.Series(pd.Categorical(verdict_lookup[pair_codes]), index=df.index, name='Product_Match')
+
+
+def score_unmatched_molecules(df: pd.DataFrame, catalog: List[str]) -> tuple[pd.Series, pd.Series]:
+    """
+    Fuzzy-score every distinct unmatched MVS molecule against the product catalog.
+    Candidates are pruned with a token-prefix blocking index, and each batch is scored
+    as one similarity matrix on all cores. Returns the score and best candidate per record.
+    """
+    if fuzz is None:
+        print("ERROR: Fuzzy mode requires the 'rapidfuzz' package (pip install rapidfuzz)")
+        sys.exit(1)
+
+    unmatched = (df['Product_Match'] == 'FALSE') & df['MVS_Molecule'].notna()
+    queries = [str(value) for value in pd.unique(df.loc[unmatched, 'MVS_Molecule'])]
+    catalog = [name for name in dict.fromkeys(catalog) if name]
+    print(f"Fuzzy matching {len(queries):,} distinct unmatched molecules against {len(catalog):,} products...")
+
+    best_scores: Dict[str, float] = {}
+    best_candidates: Dict[str, str] = {}
+
+    # Blocking index: token prefix -> catalog positions
+    blocks: Dict[str, Set[int]] = {}
+    for position, name in enumerate(catalog):
+        for token in FUZZY_TOKEN_PATTERN.findall(name.lower()):
+            blocks.setdefault(token[:FUZZY_BLOCK_PREFIX_LENGTH], set()).add(position)
+
+    compared_pairs = 0
+    for batch_start in range(0, len(queries), FUZZY_BATCH_SIZE):
+        batch = queries[batch_start:batch_start + FUZZY_BATCH_SIZE]
+        candidate_sets = [
+            set().union(*(blocks.get(token[:FUZZY_BLOCK_PREFIX_LENGTH], set())
+                          for token in FUZZY_TOKEN_PATTERN.findall(query.lower())))
+            for query in batch
+        ]
+
+        # Only catalog entries that are a candidate for some query enter the matrix
+        columns = sorted(set().union(*candidate_sets)) if candidate_sets else []
+        if not columns:
+            continue
+        column_index = {position: index for index, position in enumerate(columns)}
+        candidate_mask = np.zeros((len(batch), len(columns)), dtype=bool)
+        for row, candidates in enumerate(candidate_sets):
+            candidate_mask[row, [column_index[position] for position in candidates]] = True
+        compared_pairs += int(candidate_mask.sum())
+
+        scores = rapidfuzz_process.cdist(
+            batch, [catalog[position] for position in columns],
+            scorer=fuzz.token_set_ratio, processor=rapidfuzz_utils.default_process,
+            dtype=np.float32, workers=-1
+        )
+        scores = np.where(candidate_mask, scores, -1.0)
+        best_columns = scores.argmax(axis=1)
+
+        for row, query in enumerate(batch):
+            best_score = scores[row, best_columns[row]]
+            if best_score >= 0:
+                best_scores[query] = round(float(best_score), 1)
+                best_candidates[query] = catalog[columns[best_columns[row]]]
+
+    print(f"  Compared {compared_pairs:,} blocked pairs instead of {len(queries) * len(catalog):,}")
+    print(f"  Molecules with a candidate: {len(best_scores):,}")
+
+    molecules = df['MVS_Molecule'].astype(object)
+    score = molecules.map(best_scores).where(unmatched)
+    candidate = molecules.map(best_candidates).where(unmatched).fillna("")
+    return score.rename('Product_Match_Score'), candidate.rename('Best_RIM_Candidate')
+
+
+def write_csv_in_chunks(df: pd.DataFrame, output_file: pathlib.Path, chunk_rows: int = CSV_CHUNK_ROWS):
+    """Write a DataFrame to CSV in row chunks, so only one chunk is formatted in memory at a time."""
+    with open(output_file, 'w', encoding='utf-8', newline='') as handle:
+        if df.empty:
+            df.to_csv(handle, index=False)
+            return
+        for start in range(0, len(df), chunk_rows):
+            df.iloc[start:start + chunk_rows].to_csv(handle, index=False, header=(start == 0))
+
+
+def write_csv_with_retry(df: pd.DataFrame, output_file: pathlib.Path):
+    """Write the results CSV with file lock handling and retry mechanism."""
+    attempt = 0
+    while True:
+        try:
+            write_csv_in_chunks(df, output_file)
+            break
+        except PermissionError:
+            print(f"ERROR: File is locked: {output_file}")
+            attempt += 1
+            wait_for_unlock(output_file, attempt)
+            continue
+        except Exception as e:
+            print(f"ERROR: Could not write file: {output_file}")
+            print(f"Error details: {e}")
+            sys.exit(1)
+
+
+def process_product_comparison(input_file: pathlib.Path, output_file: pathlib.Path, product_file: pathlib.Path,
+                               lov_file: pathlib.Path, fuzzy: bool = False, workers: int = 1,
+                               use_verdict_cache: bool = True):
     """Process the product comparison analysis."""
     print("======================================================================")
     print("PRODUCT DATA COMPARISON ANALYSIS")
     print("======================================================================")
     
-    # Load input data
-    print(f"Reading input file: {input_file}")
-    
-    if not input_file.exists():
+    # Load input data (typed columnar copy from script 03 if available)
+    if not stage_output_exists(input_file):
         print(f"ERROR: Input file not found: {input_file}")
         sys.exit(1)
     
-    df = pd.read_csv(input_file, encoding='utf-8')
+    df = read_stage_output(input_file)
     
     # Validate required columns
     required_columns = ['MVS_Molecule', 'RIM_Product_Name']
@@ -212,54 +470,41 @@ def process_product_comparison(input_file: pathlib.Path, output_file: pathlib.Pa
     
     print(f"  Loaded {len(df)} records")
     
-    # Process product matching
-    print("Processing product matching...")
+    # A CSV read turns the day difference (blank where not comparable) into floats; keep it in whole days
+    if 'Greenlight_Date_Diff_Days' in df.columns:
+        df['Greenlight_Date_Diff_Days'] = df['Greenlight_Date_Diff_Days'].astype('Int64')
     
-    results = []
-    for idx, row in df.iterrows():
-        mvs_molecule = row['MVS_Molecule']
-        rim_product_name = row['RIM_Product_Name']
-        
-        # Perform product matching
-        product_match = check_product_match(mvs_molecule, rim_product_name)
-        
-        # Create result record with all original columns plus new match column
-        result = row.to_dict()
-        result['Product_Match'] = product_match
-        results.append(result)
-        
-        # Progress indicator
-        if (idx + 1) % 10000 == 0:
-            print(f"  Processed {idx + 1:,} records...")
+    # Load the molecule normalisation tables, then compile the known RIM molecules once
+    configure_normalizer(load_normalizer(lov_file))
+    catalog = load_product_catalog(product_file)
+    configure_molecule_matcher(build_molecule_matcher(catalog + list(df['RIM_Product_Name'].dropna().unique())))
     
-    # Create results DataFrame
-    results_df = pd.DataFrame(results)
+    # Process product matching and attach the verdicts as one column
+    print("Processing product matching...")
+    verdict_cache = VerdictCache(VERDICT_CACHE_FILE, matching_rules_version()) if use_verdict_cache else None
+    try:
+        df['Product_Match'] = match_distinct_pairs(df, workers, verdict_cache)
+    finally:
+        if verdict_cache is not None:
+            verdict_cache.close()
+    
+    # Optionally score the unmatched molecules against the catalog
+    if fuzzy:
+        df['Product_Match_Score'], df['Best_RIM_Candidate'] = score_unmatched_molecules(df, catalog)
+    results_df = df
     
     # Export results
     print(f"Exporting results to: {output_file}")
     
-    # Handle file lock with retry mechanism
-    while True:
-        try:
-            results_df.to_csv(output_file, index=False, encoding='utf-8')
-            break
-        except PermissionError:
-            print(f"ERROR: File is locked: {output_file}")
-            print("Please close the file in Excel and press Enter to retry...")
-            input("Press Enter when ready: ")
-            continue
-        except Exception as e:
-            print(f"ERROR: Could not write file: {output_file}")
-            print(f"Error details: {e}")
-            sys.exit(1)
+    write_in_background(output_file, write_csv_with_retry, results_df, output_file,
+                        success_message=f"  SUCCESS: Exported {len(results_df):,} records")
+    write_in_background(output_file, write_columnar, results_df, output_file)
     
     # Summary statistics
-    total_records = len(results_df)
     true_matches = len(results_df[results_df['Product_Match'] == 'TRUE'])
     false_matches = len(results_df[results_df['Product_Match'] == 'FALSE'])
     empty_matches = len(results_df[results_df['Product_Match'] == ''])
     
-    print(f"  SUCCESS: Exported {total_records:,} records")
     print(f"  Product matches (TRUE): {true_matches:,}")
     print(f"  Product non-matches (FALSE): {false_matches:,}")
     print(f"  Empty RIM data: {empty_matches:,}")
@@ -270,20 +515,43 @@ def process_product_comparison(input_file: pathlib.Path, output_file: pathlib.Pa
     print("======================================================================")
 
 
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Compare MVS molecules with RIM product names")
+    parser.add_argument(
+        '--fuzzy', action='store_true',
+        help="Add Product_Match_Score and Best_RIM_Candidate for unmatched molecules (requires rapidfuzz)"
+    )
+    parser.add_argument(
+        '--no-verdict-cache', action='store_true',
+        help="Re-evaluate every pair instead of reusing verdicts stored by previous runs"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="Number of processes evaluating the distinct molecule/product pairs (default: 1)"
+    )
+    return parser.parse_args()
+
+
 def main():
     """Main function to run the product comparison analysis."""
+    args = parse_arguments()
+    
     # Define file paths
     input_file = pathlib.Path("03 - Compare Unique IDs and Green Light.csv")
     output_file = pathlib.Path("04 - Product Data comparison.csv")
+    product_file = pathlib.Path("03 Target RIM/product__v.csv")
+    lov_file = pathlib.Path("04 Transformation Maps/LoV Object Mapping.xlsx")
     
     # Validate input file
-    if not input_file.exists():
+    if not stage_output_exists(input_file):
         print(f"ERROR: Input file not found: {input_file}")
         print("Please run script 03 first to generate the required input data.")
         sys.exit(1)
     
     # Process the comparison
-    process_product_comparison(input_file, output_file)
+    process_product_comparison(input_file, output_file, product_file, lov_file, fuzzy=args.fuzzy, workers=args.workers,
+                               use_verdict_cache=not args.no_verdict_cache)
 
 
 if __name__ == "__main__":
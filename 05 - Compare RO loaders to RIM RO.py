@@ -2,85 +2,53 @@
 """
 05 - Compare RO loaders to RIM RO Script
 Compares RO loader expectations with actual RIM RO creation and updates.
-Analyzes counts, non-null records, and unique ID permutations across systems.
+Analyzes counts, non-null records, and unique ID permutations across systems,
+and lists every individual ID whose expected and observed actions differ.
 """
 
 import pandas as pd
 import pathlib
 import sys
-from datetime import datetime
 import migration_config
+from typing import List
+from columnar_io import read_csv_cached, write_columnar
+from dataset_registry import wait_for_unlock, write_in_background
+from migration_window import CREATED_IN_WINDOW, UPDATED_IN_WINDOW, classify_waves, get_migration_waves
 
 
-def parse_rim_date(date_str):
-    """Parse RIM date string to datetime object."""
-    if pd.isna(date_str) or not str(date_str).strip():
-        return None
-    
-    try:
-        # Handle RIM ISO format: 2025-09-12T16:38:00.000Z
-        date_str = str(date_str).strip()
-        if date_str.endswith('Z'):
-            date_str = date_str[:-1]  # Remove Z
-        if '.' in date_str:
-            date_str = date_str.split('.')[0]  # Remove milliseconds
-        
-        return datetime.fromisoformat(date_str)
-    except:
-        return None
-
-
-def is_in_migration_range(date_obj, start_date_str, end_date_str):
-    """Check if date is within migration range."""
-    if date_obj is None:
-        return False
-    
-    start_date = parse_rim_date(start_date_str)
-    end_date = parse_rim_date(end_date_str)
-    
-    if start_date is None or end_date is None:
-        return False
-    
-    return start_date <= date_obj <= end_date
-
+# Per-ID discrepancy output
+DISCREPANCY_OUTPUT_FILE = pathlib.Path("05 - Compare RO loaders to RIM RO - ID Discrepancies.csv")
+ACTION_BY_LIFECYCLE = {CREATED_IN_WINDOW: 'Create', UPDATED_IN_WINDOW: 'Update'}
+ACTION_PAST_TENSE = {'Create': 'created', 'Update': 'updated'}
 
-def is_before_migration_start(date_obj, start_date_str):
-    """Check if date is before migration start."""
-    if date_obj is None:
-        return False
-    
-    start_date = parse_rim_date(start_date_str)
-    if start_date is None:
-        return False
-    
-    return date_obj < start_date
 
+def summarize_ids(ids: pd.Series) -> tuple[int, int, int, set]:
+    """Row count, non-null/empty IDs, unique ID permutations and the set of stripped IDs for one ID column."""
+    stripped = ids.dropna().astype(str).str.strip()
+    non_empty = stripped[stripped != '']
+    return len(ids), len(non_empty), len(stripped.unique()), set(non_empty)
 
-def analyze_loader_create_expected():
-    """Analyze RO expected to be created from loader create file."""
-    print("Analyzing RO expected to be created (Loader Create)...")
 
-    file_path = pathlib.Path(migration_config.LOADER_CREATE_FILE)
+def load_loader_ids(file_path: pathlib.Path, id_col: str, loader_name: str) -> pd.Series:
+    """Load the external ID column of one loader sheet."""
     if not file_path.exists():
-        print(f"ERROR: Loader Create file not found: {file_path}")
+        print(f"ERROR: {loader_name} file not found: {file_path}")
         sys.exit(1)
 
-    df = pd.read_csv(file_path, encoding='utf-8')
-
-    if 'external_id__v' not in df.columns:
-        print("ERROR: 'external_id__v' column not found in Loader Create file")
+    header = pd.read_csv(file_path, encoding='utf-8', nrows=0).columns
+    if id_col not in header:
+        print(f"ERROR: '{id_col}' column not found in {loader_name} file")
         sys.exit(1)
 
-    total_rows = len(df)
-    non_null_ids = df['external_id__v'].notna().sum()
-    non_empty_ids = len([x for x in df['external_id__v'] if pd.notna(x) and str(x).strip()])
-    unique_ids = len(df['external_id__v'].dropna().astype(str).str.strip().unique())
+    return pd.read_csv(file_path, encoding='utf-8', usecols=[id_col])[id_col]
+
+
+def analyze_loader_create_expected(create_ids: pd.Series):
+    """Analyze RO expected to be created from loader create file."""
+    print("Analyzing RO expected to be created (Loader Create)...")
 
-    # Collect expected create IDs for discrepancy analysis
-    expected_create_ids = set()
-    for value in df['external_id__v']:
-        if pd.notna(value) and str(value).strip():
-            expected_create_ids.add(str(value).strip())
+    # Counts and expected create IDs for discrepancy analysis
+    total_rows, non_empty_ids, unique_ids, expected_create_ids = summarize_ids(create_ids)
 
     print(f"  Total rows: {total_rows}")
     print(f"  Non-null/empty IDs: {non_empty_ids}")
@@ -94,56 +62,35 @@ def analyze_loader_create_expected():
     }
 
 
-def analyze_rim_created():
-    """Analyze RO actually created in RIM (both created and modified in migration range)."""
-    print("Analyzing RO created in RIM (created & modified in migration range)...")
-
+def load_rim_extract() -> pd.DataFrame:
+    """Load the RIM extract once; created and updated partitions are masks on this frame."""
     file_path = pathlib.Path(migration_config.RIM_FILTERED_FILE)
     if not file_path.exists():
         print(f"ERROR: RIM file not found: {file_path}")
         sys.exit(1)
 
-    df = pd.read_csv(file_path, encoding='utf-8')
-
+    print(f"Loading RIM extract: {file_path}")
     created_col, modified_col = migration_config.get_rim_date_columns()
-    start_date, end_date = migration_config.get_migration_date_range()
+    required_cols = ['id', created_col, modified_col, 'external_id__c']
 
-    if created_col not in df.columns:
-        print(f"ERROR: '{created_col}' column not found in RIM file")
-        sys.exit(1)
+    # Validate the header, then read only the columns the analysis needs (as text, shared with script 06)
+    header = pd.read_csv(file_path, encoding='utf-8', nrows=0).columns
+    for col in required_cols:
+        if col not in header:
+            print(f"ERROR: '{col}' column not found in RIM file")
+            sys.exit(1)
 
-    if modified_col not in df.columns:
-        print(f"ERROR: '{modified_col}' column not found in RIM file")
-        sys.exit(1)
+    df = read_csv_cached(file_path, required_cols, dtype=str)
 
-    if 'external_id__c' not in df.columns:
-        print("ERROR: 'external_id__c' column not found in RIM file")
-        sys.exit(1)
+    print(f"  Loaded {len(df)} RIM records")
+    return df
+
+
+def analyze_rim_created(rim_ids: pd.Series):
+    """Analyze RO actually created in RIM (both created and modified in the wave)."""
+    print("Analyzing RO created in RIM (created & modified in migration range)...")
 
-    # Filter for records where both created and modified dates are in migration range
-    filtered_rows = []
-    rim_created_ids = set()
-
-    for _, row in df.iterrows():
-        created_date = parse_rim_date(row[created_col])
-        modified_date = parse_rim_date(row[modified_col])
-
-        if (is_in_migration_range(created_date, start_date, end_date) and
-            is_in_migration_range(modified_date, start_date, end_date)):
-            filtered_rows.append(row)
-            # Collect IDs for discrepancy analysis
-            if pd.notna(row['external_id__c']) and str(row['external_id__c']).strip():
-                rim_created_ids.add(str(row['external_id__c']).strip())
-
-    if filtered_rows:
-        filtered_df = pd.DataFrame(filtered_rows)
-        total_rows = len(filtered_df)
-        non_empty_ids = len([x for x in filtered_df['external_id__c'] if pd.notna(x) and str(x).strip()])
-        unique_ids = len(filtered_df['external_id__c'].dropna().astype(str).str.strip().unique())
-    else:
-        total_rows = 0
-        non_empty_ids = 0
-        unique_ids = 0
+    total_rows, non_empty_ids, unique_ids, rim_created_ids = summarize_ids(rim_ids)
 
     print(f"  Total rows (created & modified in range): {total_rows}")
     print(f"  Non-null/empty IDs: {non_empty_ids}")
@@ -157,30 +104,12 @@ def analyze_rim_created():
     }
 
 
-def analyze_loader_update_expected():
+def analyze_loader_update_expected(update_ids: pd.Series):
     """Analyze RO expected to be updated from loader update file."""
     print("Analyzing RO expected to be updated (Loader Update)...")
 
-    file_path = pathlib.Path(migration_config.LOADER_UPDATE_FILE)
-    if not file_path.exists():
-        print(f"ERROR: Loader Update file not found: {file_path}")
-        sys.exit(1)
-
-    df = pd.read_csv(file_path, encoding='utf-8')
-
-    if 'external_id__c' not in df.columns:
-        print("ERROR: 'external_id__c' column not found in Loader Update file")
-        sys.exit(1)
-
-    total_rows = len(df)
-    non_empty_ids = len([x for x in df['external_id__c'] if pd.notna(x) and str(x).strip()])
-    unique_ids = len(df['external_id__c'].dropna().astype(str).str.strip().unique())
-
-    # Collect expected update IDs for discrepancy analysis
-    expected_update_ids = set()
-    for value in df['external_id__c']:
-        if pd.notna(value) and str(value).strip():
-            expected_update_ids.add(str(value).strip())
+    # Counts and expected update IDs for discrepancy analysis
+    total_rows, non_empty_ids, unique_ids, expected_update_ids = summarize_ids(update_ids)
 
     print(f"  Total rows: {total_rows}")
     print(f"  Non-null/empty IDs: {non_empty_ids}")
@@ -194,44 +123,11 @@ def analyze_loader_update_expected():
     }
 
 
-def analyze_rim_updated():
-    """Analyze RO actually updated in RIM (modified in range, created before range)."""
+def analyze_rim_updated(rim_ids: pd.Series):
+    """Analyze RO actually updated in RIM (modified in the wave, created before it)."""
     print("Analyzing RO updated in RIM (modified in range, created before range)...")
 
-    file_path = pathlib.Path(migration_config.RIM_FILTERED_FILE)
-    if not file_path.exists():
-        print(f"ERROR: RIM file not found: {file_path}")
-        sys.exit(1)
-
-    df = pd.read_csv(file_path, encoding='utf-8')
-
-    created_col, modified_col = migration_config.get_rim_date_columns()
-    start_date, end_date = migration_config.get_migration_date_range()
-
-    # Filter for records where modified is in range but created is before range
-    filtered_rows = []
-    rim_updated_ids = set()
-
-    for _, row in df.iterrows():
-        created_date = parse_rim_date(row[created_col])
-        modified_date = parse_rim_date(row[modified_col])
-
-        if (is_in_migration_range(modified_date, start_date, end_date) and
-            is_before_migration_start(created_date, start_date)):
-            filtered_rows.append(row)
-            # Collect IDs for discrepancy analysis
-            if pd.notna(row['external_id__c']) and str(row['external_id__c']).strip():
-                rim_updated_ids.add(str(row['external_id__c']).strip())
-
-    if filtered_rows:
-        filtered_df = pd.DataFrame(filtered_rows)
-        total_rows = len(filtered_df)
-        non_empty_ids = len([x for x in filtered_df['external_id__c'] if pd.notna(x) and str(x).strip()])
-        unique_ids = len(filtered_df['external_id__c'].dropna().astype(str).str.strip().unique())
-    else:
-        total_rows = 0
-        non_empty_ids = 0
-        unique_ids = 0
+    total_rows, non_empty_ids, unique_ids, rim_updated_ids = summarize_ids(rim_ids)
 
     print(f"  Total rows (modified in range, created before): {total_rows}")
     print(f"  Non-null/empty IDs: {non_empty_ids}")
@@ -245,78 +141,114 @@ def analyze_rim_updated():
     }
 
 
-def analyze_create_discrepancies(expected_create_ids: set, rim_created_ids: set) -> str:
-    """Analyze discrepancies between expected create and actual RIM created."""
-    print("Analyzing create discrepancies...")
+def explode_ids(ids: pd.Series) -> pd.Series:
+    """Split pipe-delimited IDs into one stripped ID per row, keeping the source row index."""
+    ids = ids.dropna().astype(str).str.strip()
 
-    # Find IDs expected but not created
-    expected_not_created = expected_create_ids - rim_created_ids
-    # Find IDs created but not expected
-    created_not_expected = rim_created_ids - expected_create_ids
+    # Only values holding several IDs need splitting
+    multiple = ids.str.contains('|', regex=False)
+    if multiple.any():
+        split_ids = ids[multiple].str.split('|').explode().str.strip()
+        ids = pd.concat([ids[~multiple], split_ids]).sort_index(kind='stable')
+    return ids[ids != '']
 
-    discrepancies = []
 
-    if expected_not_created:
-        discrepancies.append(f"Expected but not created: {', '.join(sorted(expected_not_created))}")
+def anti_join(left: pd.DataFrame, right: pd.DataFrame, on: List[str]) -> pd.DataFrame:
+    """Rows of left with no match in right on the key columns (hash join)."""
+    merged = left.merge(right[on].drop_duplicates(), on=on, how='left', indicator=True)
+    return merged[merged['_merge'] == 'left_only'].drop(columns='_merge')
 
-    if created_not_expected:
-        discrepancies.append(f"Created but not expected: {', '.join(sorted(created_not_expected))}")
 
-    discrepancy_text = " | ".join(discrepancies) if discrepancies else ""
+def build_expected_actions(create_ids: pd.Series, update_ids: pd.Series) -> pd.DataFrame:
+    """One row per individual loader ID and the action the loader expects for it."""
+    create = explode_ids(create_ids)
+    update = explode_ids(update_ids)
+    return pd.DataFrame({
+        'ID': pd.concat([create, update], ignore_index=True).astype(object),
+        'Action': ['Create'] * len(create) + ['Update'] * len(update),
+    }).drop_duplicates(ignore_index=True)
 
-    print(f"  Expected not created: {len(expected_not_created)}")
-    print(f"  Created not expected: {len(created_not_expected)}")
 
-    return discrepancy_text
+def build_observed_actions(rim_df: pd.DataFrame, rim_waves: pd.DataFrame) -> pd.DataFrame:
+    """One row per individual ID on a RIM record created or updated in a wave, with the record id."""
+    migrated = rim_waves['Lifecycle'].isin(list(ACTION_BY_LIFECYCLE))
+    ids = explode_ids(rim_df.loc[migrated, 'external_id__c'])
+    return pd.DataFrame({
+        'ID': ids.astype(object).to_numpy(),
+        'Action': rim_waves['Lifecycle'].astype(object).loc[ids.index].map(ACTION_BY_LIFECYCLE).to_numpy(),
+        'Wave': rim_waves['Wave'].astype(object).loc[ids.index].to_numpy(),
+        'RIM_Record_ID': rim_df['id'].loc[ids.index].to_numpy(),
+    }).drop_duplicates(ignore_index=True)
 
 
-def analyze_update_discrepancies(expected_update_ids: set, rim_updated_ids: set) -> str:
-    """Analyze discrepancies between expected update and actual RIM updated."""
-    print("Analyzing update discrepancies...")
+def analyze_id_discrepancies(expected: pd.DataFrame, observed: pd.DataFrame) -> pd.DataFrame:
+    """
+    Long table of every ID whose expected and observed actions differ
+    (ID, Expected_Action, Observed_Action, Wave, RIM_Record_ID, Discrepancy).
+    """
+    print("Analyzing per-ID create/update discrepancies...")
+    print(f"  Expected loader IDs: {len(expected)}, observed RIM IDs: {len(observed)}")
 
-    # Find IDs expected but not updated
-    expected_not_updated = expected_update_ids - rim_updated_ids
-    # Find IDs updated but not expected
-    updated_not_expected = rim_updated_ids - expected_update_ids
+    # Join on integer ID codes; codes follow sorted ID order
+    id_codes, id_values = pd.factorize(pd.concat([expected['ID'], observed['ID']], ignore_index=True), sort=True)
+    expected = expected.assign(ID=id_codes[:len(expected)])
+    observed = observed.assign(ID=id_codes[len(expected):])
 
-    discrepancies = []
+    # Expected but not observed with that action; show any other action seen for the ID
+    missing = anti_join(expected, observed, ['ID', 'Action']).rename(columns={'Action': 'Expected_Action'})
+    missing = missing.merge(observed.rename(columns={'Action': 'Observed_Action'}), on='ID', how='left')
+    missing['Discrepancy'] = 'Expected but not ' + missing['Expected_Action'].map(ACTION_PAST_TENSE)
 
-    if expected_not_updated:
-        discrepancies.append(f"Expected but not updated: {', '.join(sorted(expected_not_updated))}")
+    # Observed but not expected with that action; show any other action expected for the ID
+    unexpected = anti_join(observed, expected, ['ID', 'Action']).rename(columns={'Action': 'Observed_Action'})
+    unexpected = unexpected.merge(expected.rename(columns={'Action': 'Expected_Action'}), on='ID', how='left')
+    unexpected['Discrepancy'] = unexpected['Observed_Action'].map(ACTION_PAST_TENSE).str.capitalize() + ' but not expected'
 
-    if updated_not_expected:
-        discrepancies.append(f"Updated but not expected: {', '.join(sorted(updated_not_expected))}")
+    columns = ['ID', 'Expected_Action', 'Observed_Action', 'Wave', 'RIM_Record_ID', 'Discrepancy']
+    discrepancies = pd.concat([missing[columns], unexpected[columns]], ignore_index=True)
+    discrepancies = discrepancies.sort_values(['ID', 'Discrepancy'], kind='stable', ignore_index=True)
+    discrepancies['ID'] = id_values[discrepancies['ID'].to_numpy()]
 
-    discrepancy_text = " | ".join(discrepancies) if discrepancies else ""
+    for discrepancy, count in discrepancies['Discrepancy'].value_counts().sort_index().items():
+        print(f"  {discrepancy}: {count}")
 
-    print(f"  Expected not updated: {len(expected_not_updated)}")
-    print(f"  Updated not expected: {len(updated_not_expected)}")
+    return discrepancies
 
-    return discrepancy_text
 
-
-def export_results(results: dict, output_file: pathlib.Path):
-    """Export results to CSV file with file lock handling."""
-    print(f"Exporting results to: {output_file}")
-    
-    # Create single row with all results
-    results_df = pd.DataFrame([results])
-    
-    # Handle file lock with retry mechanism
+def write_csv_with_retry(df: pd.DataFrame, output_file: pathlib.Path):
+    """Write CSV with file lock handling and retry mechanism."""
+    attempt = 0
     while True:
         try:
-            results_df.to_csv(output_file, index=False, encoding='utf-8')
+            df.to_csv(output_file, index=False, encoding='utf-8')
             break
         except PermissionError:
             print(f"ERROR: File is locked: {output_file}")
-            print("Please close the file in Excel and press Enter to retry...")
-            input("Press Enter when ready: ")
+            attempt += 1
+            wait_for_unlock(output_file, attempt)
             continue
         except Exception:
             print(f"ERROR: Could not write file: {output_file}")
             sys.exit(1)
+
+
+def export_discrepancies(discrepancies: pd.DataFrame, output_file: pathlib.Path):
+    """Export the per-ID discrepancy table."""
+    print(f"Exporting ID discrepancies to: {output_file}")
+    write_in_background(output_file, write_csv_with_retry, discrepancies, output_file,
+                        success_message=f"  SUCCESS: Exported {len(discrepancies)} ID discrepancies")
+    write_in_background(output_file, write_columnar, discrepancies, output_file)
+
+
+def export_results(results: List[dict], output_file: pathlib.Path):
+    """Export results to CSV file with file lock handling."""
+    print(f"Exporting results to: {output_file}")
     
-    print(f"  SUCCESS: Exported comparison analysis")
+    # One row per migration wave
+    results_df = pd.DataFrame(results)
+    write_in_background(output_file, write_csv_with_retry, results_df, output_file,
+                        success_message="  SUCCESS: Exported comparison analysis")
+    write_in_background(output_file, write_columnar, results_df, output_file)
 
 
 def main():
@@ -325,26 +257,51 @@ def main():
     print("RO LOADERS TO RIM RO COMPARISON ANALYSIS")
     print("=" * 70)
     
-    start_date, end_date = migration_config.get_migration_date_range()
-    print(f"Migration date range: {start_date} to {end_date}")
+    try:
+        waves = get_migration_waves()
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    for wave in waves:
+        print(f"Migration wave '{wave.name}': {wave.start} to {wave.end}")
     print()
     
-    # Perform all analyses
-    create_expected = analyze_loader_create_expected()
-    rim_created = analyze_rim_created()
-    update_expected = analyze_loader_update_expected()
-    rim_updated = analyze_rim_updated()
+    # Load and classify the RIM extract once; both partitions are boolean masks on it
+    rim_df = load_rim_extract()
+    rim_waves = classify_waves(rim_df, waves)
+    created_mask = rim_waves['Lifecycle'] == CREATED_IN_WINDOW
+    updated_mask = rim_waves['Lifecycle'] == UPDATED_IN_WINDOW
     
-    # Combine all results
-    all_results = {**create_expected, **rim_created, **update_expected, **rim_updated}
+    create_ids = load_loader_ids(pathlib.Path(migration_config.LOADER_CREATE_FILE), 'external_id__v', "Loader Create")
+    update_ids = load_loader_ids(pathlib.Path(migration_config.LOADER_UPDATE_FILE), 'external_id__c', "Loader Update")
+    create_expected = analyze_loader_create_expected(create_ids)
+    update_expected = analyze_loader_update_expected(update_ids)
+    
+    # Combine all results, one row per wave
+    all_results = []
+    for wave in waves:
+        print(f"\n--- {wave.name} ---")
+        in_wave = rim_waves['Wave'] == wave.name
+        rim_created = analyze_rim_created(rim_df.loc[in_wave & created_mask, 'external_id__c'])
+        rim_updated = analyze_rim_updated(rim_df.loc[in_wave & updated_mask, 'external_id__c'])
+        all_results.append({'Wave': wave.name, **create_expected, **rim_created, **update_expected, **rim_updated})
     
     # Export results
     output_file = pathlib.Path("05 - Compare RO loaders to RIM RO.csv")
     export_results(all_results, output_file)
     
+    # Per-ID discrepancies across all waves
+    print()
+    discrepancies = analyze_id_discrepancies(
+        build_expected_actions(create_ids, update_ids),
+        build_observed_actions(rim_df, rim_waves)
+    )
+    export_discrepancies(discrepancies, DISCREPANCY_OUTPUT_FILE)
+    
     print("\n" + "=" * 70)
     print("RO LOADERS TO RIM RO COMPARISON COMPLETED SUCCESSFULLY")
     print(f"Output file: {output_file}")
+    print(f"ID discrepancies: {DISCREPANCY_OUTPUT_FILE}")
     print("=" * 70)
 
 
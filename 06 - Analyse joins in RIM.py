@@ -2,85 +2,48 @@
 """
 06 - Analyse joins in RIM Script
 Analyzes joins in RIM for created and updated ROs during migration.
-Creates separate outputs for created and updated RO join analysis.
+Creates separate outputs for created and updated RO join analysis, and a
+loader-vs-RIM comparison of per-RO fan-out along the relationship graph.
 """
 
 import pandas as pd
 import pathlib
 import sys
-from datetime import datetime
 import migration_config
+import relationship_graph
+from columnar_io import read_csv_cached, write_columnar
+from dataset_registry import wait_for_unlock, write_in_background
+from migration_window import CREATED_IN_WINDOW, UPDATED_IN_WINDOW, classify_waves, get_migration_waves
 
 
-def parse_rim_date(date_str):
-    """Parse RIM date string to datetime object."""
-    if pd.isna(date_str) or not str(date_str).strip():
-        return None
-    
-    try:
-        # Handle RIM ISO format: 2025-09-12T16:38:00.000Z
-        date_str = str(date_str).strip()
-        if date_str.endswith('Z'):
-            date_str = date_str[:-1]  # Remove Z
-        if '.' in date_str:
-            date_str = date_str.split('.')[0]  # Remove milliseconds
-        
-        return datetime.fromisoformat(date_str)
-    except:
-        return None
+# Input files and the only columns the analysis reads from each (all parsed as text)
+REGISTRATION_JOIN_FILE = pathlib.Path("03 Target RIM/registration_regulatory_objective__rim_data.csv")
+DRUG_PRODUCT_JOIN_FILE = pathlib.Path("03 Target RIM/regulatory_objective_drug_product__v_data.csv")
 
 
-def is_in_migration_range(date_obj, start_date_str, end_date_str):
-    """Check if date is within migration range."""
-    if date_obj is None:
-        return False
-    
-    start_date = parse_rim_date(start_date_str)
-    end_date = parse_rim_date(end_date_str)
-    
-    if start_date is None or end_date is None:
-        return False
-    
-    return start_date <= date_obj <= end_date
-
-
-def is_before_migration_start(date_obj, start_date_str):
-    """Check if date is before migration start."""
-    if date_obj is None:
-        return False
+def load_input(file_path, columns, description):
+    """Load the projected columns of one input, parsed once and cached by file hash."""
+    if not file_path.exists():
+        print(f"ERROR: {description} file not found: {file_path}")
+        sys.exit(1)
     
-    start_date = parse_rim_date(start_date_str)
-    if start_date is None:
-        return False
+    # Validate columns
+    header = pd.read_csv(file_path, encoding='utf-8', nrows=0).columns
+    for col in columns:
+        if col not in header:
+            print(f"ERROR: '{col}' column not found in {description.lower()} file")
+            sys.exit(1)
     
-    return date_obj < start_date
+    return read_csv_cached(file_path, columns, dtype=str)
 
 
 def load_join_files():
     """Load the join files for analysis."""
     print("Loading join files...")
+    created_col, modified_col = migration_config.get_rim_date_columns()
     
-    # Load registration_regulatory_objective file
-    reg_file = pathlib.Path("03 Target RIM/registration_regulatory_objective__rim_data.csv")
-    if not reg_file.exists():
-        print(f"ERROR: Registration join file not found: {reg_file}")
-        sys.exit(1)
-    
-    df_reg = pd.read_csv(reg_file, encoding='utf-8')
-    if 'regulatory_objective__rim' not in df_reg.columns:
-        print("ERROR: 'regulatory_objective__rim' column not found in registration join file")
-        sys.exit(1)
-    
-    # Load drug_product join file
-    drug_file = pathlib.Path("03 Target RIM/regulatory_objective_drug_product__v_data.csv")
-    if not drug_file.exists():
-        print(f"ERROR: Drug product join file not found: {drug_file}")
-        sys.exit(1)
-    
-    df_drug = pd.read_csv(drug_file, encoding='utf-8')
-    if 'regulatory_objective__v' not in df_drug.columns:
-        print("ERROR: 'regulatory_objective__v' column not found in drug product join file")
-        sys.exit(1)
+    df_reg = load_input(REGISTRATION_JOIN_FILE, ['regulatory_objective__rim'], "Registration join")
+    df_drug = load_input(DRUG_PRODUCT_JOIN_FILE, ['regulatory_objective__v', created_col, modified_col], "Drug product join")
     
     print(f"  Loaded registration joins: {len(df_reg)} rows")
     print(f"  Loaded drug product joins: {len(df_drug)} rows")
@@ -88,151 +51,155 @@ def load_join_files():
     return df_reg, df_drug
 
 
-def count_joins(target_id, df, column_name):
-    """Count how many times an ID appears in a join file column."""
-    if pd.isna(target_id) or not str(target_id).strip():
-        return 0
-    
-    target_id_str = str(target_id).strip()
-    count = 0
-    
-    for value in df[column_name]:
-        if pd.notna(value) and str(value).strip() == target_id_str:
-            count += 1
-    
-    return count
+def clean_ids(ids):
+    """Stripped ID values, empty string when missing."""
+    return ids.astype(object).where(ids.notna(), '').astype(str).str.strip()
 
 
-def analyze_created_ros():
-    """Analyze joins for created ROs (created & modified in migration range)."""
-    print("Analyzing joins for created ROs...")
-    
-    # Load RIM data
-    rim_file = pathlib.Path(migration_config.RIM_FILTERED_FILE)
-    if not rim_file.exists():
-        print(f"ERROR: RIM file not found: {rim_file}")
-        sys.exit(1)
-    
-    df_rim = pd.read_csv(rim_file, encoding='utf-8')
-    
+def join_counts(df, column_name):
+    """Count join rows per RO id with one value_counts over a join file column."""
+    return df[column_name].dropna().astype(str).str.strip().value_counts()
+
+
+def lookup_join_counts(ro_ids, counts):
+    """Look up the join count of each RO id (0 for blank ids and ids without joins)."""
+    keys = clean_ids(ro_ids)
+    looked_up = keys.map(counts).fillna(0).astype(int)
+    return looked_up.where(keys != '', 0)
+
+
+def load_rim_extract():
+    """Load the RIM extract once for created and updated RO analysis."""
     created_col, modified_col = migration_config.get_rim_date_columns()
-    start_date, end_date = migration_config.get_migration_date_range()
+    required_cols = ['id', 'external_id__c', created_col, modified_col]
     
-    # Validate columns
-    required_cols = [created_col, modified_col, 'external_id__c', 'id']
-    for col in required_cols:
-        if col not in df_rim.columns:
-            print(f"ERROR: '{col}' column not found in RIM file")
-            sys.exit(1)
+    df_rim = load_input(pathlib.Path(migration_config.RIM_FILTERED_FILE), required_cols, "RIM")
     
-    # Load join files
-    df_reg, df_drug = load_join_files()
+    print(f"  Loaded RIM records: {len(df_rim)} rows")
+    return df_rim
+
+
+def analyze_created_ros(df_rim, rim_waves, df_reg, df_drug):
+    """Analyze joins for created ROs (created & modified in the same migration wave)."""
+    print("Analyzing joins for created ROs...")
     
-    # Filter for created ROs (both created and modified in migration range)
-    created_ros = []
+    # Filter for created ROs (both created and modified in their wave)
+    created_mask = rim_waves['Lifecycle'] == CREATED_IN_WINDOW
+    created = df_rim[created_mask]
     
-    for _, row in df_rim.iterrows():
-        created_date = parse_rim_date(row[created_col])
-        modified_date = parse_rim_date(row[modified_col])
-        
-        if (is_in_migration_range(created_date, start_date, end_date) and 
-            is_in_migration_range(modified_date, start_date, end_date)):
-            
-            external_id = row['external_id__c']
-            ro_id = row['id']
-            
-            # Count joins
-            reg_joins = count_joins(ro_id, df_reg, 'regulatory_objective__rim')
-            drug_joins = count_joins(ro_id, df_drug, 'regulatory_objective__v')
-            
-            created_ros.append({
-                'External_ID': str(external_id).strip() if pd.notna(external_id) else '',
-                'Registration_Joins': reg_joins,
-                'Drug_Product_Joins': drug_joins
-            })
+    # Count joins once per join file, then look them up by RO id
+    created_ros = pd.DataFrame({
+        'Wave': rim_waves.loc[created_mask, 'Wave'],
+        'External_ID': clean_ids(created['external_id__c']),
+        'Registration_Joins': lookup_join_counts(created['id'], join_counts(df_reg, 'regulatory_objective__rim')),
+        'Drug_Product_Joins': lookup_join_counts(created['id'], join_counts(df_drug, 'regulatory_objective__v')),
+    })
     
     print(f"  Found {len(created_ros)} created ROs")
     return created_ros
 
 
-def analyze_updated_ros():
-    """Analyze joins for updated ROs (modified in range, created before range)."""
+def count_filtered_drug_joins(updated_ros, updated_ro_waves, df_drug, drug_waves):
+    """
+    Count drug product joins created before each updated RO's wave and modified during it:
+    inner join of the updated ROs with the classified join rows on (RO id, wave), then a grouped count.
+    """
+    updated_drug_mask = drug_waves['Lifecycle'] == UPDATED_IN_WINDOW
+    drug_keys = pd.DataFrame({
+        'RO_Key': clean_ids(df_drug.loc[updated_drug_mask, 'regulatory_objective__v']),
+        'Wave': drug_waves.loc[updated_drug_mask, 'Wave'].astype(object),
+    })
+    ro_keys = pd.DataFrame({
+        'RO_Key': clean_ids(updated_ros['id']),
+        'Wave': updated_ro_waves.astype(object),
+    }).rename_axis('RO_Row').reset_index()
+    
+    matched = ro_keys.merge(drug_keys[drug_keys['RO_Key'] != ''], on=['RO_Key', 'Wave'], how='inner')
+    return matched.groupby('RO_Row').size().reindex(updated_ros.index, fill_value=0)
+
+
+def analyze_updated_ros(df_rim, rim_waves, df_drug, drug_waves):
+    """Analyze joins for updated ROs (modified in a migration wave, created before it)."""
     print("Analyzing joins for updated ROs...")
     
-    # Load RIM data
-    rim_file = pathlib.Path(migration_config.RIM_FILTERED_FILE)
-    df_rim = pd.read_csv(rim_file, encoding='utf-8')
-    
-    created_col, modified_col = migration_config.get_rim_date_columns()
-    start_date, end_date = migration_config.get_migration_date_range()
-    
-    # Load join files
-    df_reg, df_drug = load_join_files()
-    
-    # Filter for updated ROs (modified in range, created before range)
-    updated_ros = []
+    # Filter for updated ROs (modified in their wave, created before it)
+    updated_mask = rim_waves['Lifecycle'] == UPDATED_IN_WINDOW
+    updated = df_rim[updated_mask]
     
-    for _, row in df_rim.iterrows():
-        created_date = parse_rim_date(row[created_col])
-        modified_date = parse_rim_date(row[modified_col])
-        
-        if (is_in_migration_range(modified_date, start_date, end_date) and 
-            is_before_migration_start(created_date, start_date)):
-            
-            external_id = row['external_id__c']
-            ro_id = row['id']
-            
-            # Count total joins in drug product file
-            total_drug_joins = count_joins(ro_id, df_drug, 'regulatory_objective__v')
-            
-            # Count joins in drug product file that were created before mig and modified during mig
-            filtered_drug_joins = 0
-            for _, drug_row in df_drug.iterrows():
-                if (pd.notna(drug_row['regulatory_objective__v']) and 
-                    str(drug_row['regulatory_objective__v']).strip() == str(ro_id).strip()):
-                    
-                    drug_created = parse_rim_date(drug_row['created_date__v'])
-                    drug_modified = parse_rim_date(drug_row['modified_date__v'])
-                    
-                    if (is_before_migration_start(drug_created, start_date) and 
-                        is_in_migration_range(drug_modified, start_date, end_date)):
-                        filtered_drug_joins += 1
-            
-            updated_ros.append({
-                'External_ID': str(external_id).strip() if pd.notna(external_id) else '',
-                'Total_Drug_Product_Joins': total_drug_joins,
-                'Filtered_Drug_Product_Joins': filtered_drug_joins
-            })
+    updated_ros = pd.DataFrame({
+        'Wave': rim_waves.loc[updated_mask, 'Wave'],
+        'External_ID': clean_ids(updated['external_id__c']),
+        # Total joins in drug product file, counted once and looked up by RO id
+        'Total_Drug_Product_Joins': lookup_join_counts(updated['id'], join_counts(df_drug, 'regulatory_objective__v')),
+        # Joins created before the RO's wave and modified during it
+        'Filtered_Drug_Product_Joins': count_filtered_drug_joins(updated, rim_waves.loc[updated_mask, 'Wave'], df_drug, drug_waves),
+    })
     
     print(f"  Found {len(updated_ros)} updated ROs")
     return updated_ros
 
 
-def export_results(results, output_file, analysis_type):
-    """Export results to CSV file with file lock handling."""
-    print(f"Exporting {analysis_type} results to: {output_file}")
-    
-    if not results:
-        print(f"  No {analysis_type} data to export")
-        return
-    
-    results_df = pd.DataFrame(results)
-    
+def analyze_relationship_fan_out(df_rim, rim_waves):
+    """Compare per-RO fan-out along every relationship path between the loader sheets and RIM."""
+    print("Analyzing relationship fan-out...")
+    
+    # RIM join tables link by RO record id; report everything by RO external ID
+    external_ids = clean_ids(df_rim['external_id__c'])
+    rim_root_ids = dict(zip(clean_ids(df_rim['id']), external_ids))
+    
+    loader_fan_out = relationship_graph.compute_fan_out(relationship_graph.LOADER_SIDE)
+    rim_fan_out = relationship_graph.compute_fan_out(relationship_graph.RIM_SIDE, rim_root_ids)
+    
+    # ROs migrated in any wave, plus any RO the loader sheets link to
+    migrated_mask = rim_waves['Wave'].notna()
+    wave_by_ro = dict(zip(external_ids[migrated_mask], rim_waves.loc[migrated_mask, 'Wave']))
+    ro_ids = pd.Series(list(wave_by_ro) + list(loader_fan_out.index), dtype=object)
+    
+    comparison = relationship_graph.compare_fan_out(ro_ids[ro_ids != ''], loader_fan_out, rim_fan_out)
+    comparison.insert(0, 'Wave', comparison['RO_External_ID'].map(wave_by_ro))
+    
+    # Paths missing a table or column on either side are blank in the output, not zero differences
+    compared = relationship_graph.comparable_paths(loader_fan_out, rim_fan_out)
+    if not compared:
+        print(f"  WARNING: None of the {len(relationship_graph.FAN_OUT_PATHS)} relationship paths could be compared "
+              f"(see the skipped tables above); no fan-out differences were checked")
+        return comparison
+    
+    print(f"  Compared {len(comparison)} ROs on {len(compared)} of {len(relationship_graph.FAN_OUT_PATHS)} paths "
+          f"({', '.join(compared)}), {int((comparison['Mismatched_Paths'] != '').sum())} with fan-out differences")
+    return comparison
+
+
+def write_csv_with_retry(results_df, output_file):
+    """Write CSV with file lock handling and retry mechanism."""
     # Handle file lock with retry mechanism
+    attempt = 0
     while True:
         try:
             results_df.to_csv(output_file, index=False, encoding='utf-8')
             break
         except PermissionError:
             print(f"ERROR: File is locked: {output_file}")
-            print("Please close the file in Excel and press Enter to retry...")
-            input("Press Enter when ready: ")
+            attempt += 1
+            wait_for_unlock(output_file, attempt)
             continue
         except Exception:
             print(f"ERROR: Could not write file: {output_file}")
             sys.exit(1)
+
+
+def export_results(results, output_file, analysis_type):
+    """Export results to CSV file with file lock handling."""
+    print(f"Exporting {analysis_type} results to: {output_file}")
+    
+    # Empty results still write a header-only file, so the stage's outputs always exist
+    if len(results) == 0:
+        print(f"  No {analysis_type} data to export, writing headers only")
     
-    print(f"  SUCCESS: Exported {len(results)} {analysis_type} records")
+    results_df = pd.DataFrame(results)
+    write_in_background(output_file, write_csv_with_retry, results_df, output_file,
+                        success_message=f"  SUCCESS: Exported {len(results)} {analysis_type} records")
+    write_in_background(output_file, write_columnar, results_df, output_file)
 
 
 def main():
@@ -241,26 +208,48 @@ def main():
     print("RIM JOINS ANALYSIS")
     print("=" * 70)
     
-    start_date, end_date = migration_config.get_migration_date_range()
-    print(f"Migration date range: {start_date} to {end_date}")
+    try:
+        waves = get_migration_waves()
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    for wave in waves:
+        print(f"Migration wave '{wave.name}': {wave.start} to {wave.end}")
+    print()
+    
+    # Load RIM and join files once, and bucket every record and join row into its wave
+    print("Loading RIM extract...")
+    df_rim = load_rim_extract()
+    df_reg, df_drug = load_join_files()
+    
+    rim_waves = classify_waves(df_rim, waves)
+    drug_waves = classify_waves(df_drug, waves)
     print()
     
     # Analyze created ROs
-    created_results = analyze_created_ros()
+    created_results = analyze_created_ros(df_rim, rim_waves, df_reg, df_drug)
     created_output = pathlib.Path("06 - Analyse joins in RIM - Joins for created ROs.csv")
     export_results(created_results, created_output, "created RO")
     
     print()
     
     # Analyze updated ROs
-    updated_results = analyze_updated_ros()
+    updated_results = analyze_updated_ros(df_rim, rim_waves, df_drug, drug_waves)
     updated_output = pathlib.Path("06 - Analyse joins in RIM - Joins for updated ROs.csv")
     export_results(updated_results, updated_output, "updated RO")
     
+    print()
+    
+    # Compare loader and RIM fan-out along the relationship graph
+    fan_out_results = analyze_relationship_fan_out(df_rim, rim_waves)
+    fan_out_output = pathlib.Path("06 - Analyse joins in RIM - Relationship fan-out.csv")
+    export_results(fan_out_results, fan_out_output, "relationship fan-out")
+    
     print("\n" + "=" * 70)
     print("RIM JOINS ANALYSIS COMPLETED SUCCESSFULLY")
     print(f"Created ROs output: {created_output}")
     print(f"Updated ROs output: {updated_output}")
+    print(f"Relationship fan-out output: {fan_out_output}")
     print("=" * 70)
 
 
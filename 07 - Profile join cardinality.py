@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+07 - Profile join cardinality Script
+Profiles the cardinality of every relationship joined by scripts 06 and 08: fan-out
+histogram, percentiles and maximum per parent key, childless parents, orphan children
+and the row count of the merge. One compact report row per relationship.
+"""
+
+import pandas as pd
+import pathlib
+import sys
+import migration_config
+import relationship_graph
+from columnar_io import write_columnar
+from join_profile import profile_join
+from relationship_graph import LOADER_SIDE, RIM_SIDE, read_key_columns
+from typing import List, NamedTuple, Optional
+
+
+OUTPUT_FILE = pathlib.Path("07 - Profile join cardinality.csv")
+REGISTRATION_JOIN_LOADER_FILE = relationship_graph.table_file("registration_regulatory_objective__rim", LOADER_SIDE)
+
+
+class ProfiledJoin(NamedTuple):
+    """One parent key -> child foreign key relationship, and the scripts that join it."""
+    stages: str
+    side: str
+    parent_file: pathlib.Path
+    parent_key: str
+    child_file: pathlib.Path
+    child_key: str
+
+
+def profiled_joins() -> List[ProfiledJoin]:
+    """Relationships of the 06 relationship graph (both sides) and the two merges of script 08."""
+    joins = {}
+
+    def add(stage, side, parent_file, parent_key, child_file, child_key):
+        key = (pathlib.Path(parent_file), parent_key, pathlib.Path(child_file), child_key)
+        stages = joins[key].stages + f"; {stage}" if key in joins else stage
+        joins[key] = ProfiledJoin(stages, side, *key)
+
+    for side in (LOADER_SIDE, RIM_SIDE):
+        for relationship in relationship_graph.RELATIONSHIPS:
+            object_table = relationship_graph.OBJECT_TABLES.get(relationship.parent, {}).get(side)
+            if object_table is None:
+                continue
+            parent_file, parent_key = object_table
+            add("06", side, parent_file, parent_key,
+                relationship_graph.table_file(relationship.table, side), relationship.parent_column)
+
+    # 08: loader ROs -> registration joins -> registrations export
+    add("08", LOADER_SIDE, migration_config.LOADER_CREATE_FILE, 'external_id__v',
+        REGISTRATION_JOIN_LOADER_FILE, 'regulatory_objective__rim')
+    add("08", LOADER_SIDE, REGISTRATION_JOIN_LOADER_FILE, 'registration_number',
+        migration_config.RIM_REGISTRATION_FILE, 'id')
+
+    return list(joins.values())
+
+
+def profile_relationship(join: ProfiledJoin) -> Optional[dict]:
+    """Profile one relationship from its two key columns; None if either table is unavailable."""
+    parent = read_key_columns(join.parent_file, [join.parent_key], "Parent table")
+    child = read_key_columns(join.child_file, [join.child_key], "Child table")
+    if parent is None or child is None:
+        return None
+
+    return {
+        'Stages': join.stages,
+        'Side': join.side,
+        'Relationship': f"{join.parent_file.name}[{join.parent_key}] -> {join.child_file.name}[{join.child_key}]",
+        **profile_join(parent[join.parent_key], child[join.child_key]),
+    }
+
+
+def print_report(report: pd.DataFrame):
+    """Print the headline figures of every profiled relationship."""
+    for row in report.itertuples(index=False):
+        print(f"  [{row.Stages}] {row.Side}: {row.Relationship}")
+        print(f"    fan-out p50 {row.P50_Fan_Out:g}, p90 {row.P90_Fan_Out:g}, p99 {row.P99_Fan_Out:g}, "
+              f"max {row.Max_Fan_Out} ({row.Max_Fan_Out_Key})")
+        print(f"    childless parents {row.Childless_Parent_Keys}, orphan child keys {row.Orphan_Child_Keys} "
+              f"({row.Orphan_Child_Rows} rows), left merge {row.Parent_Rows} -> {row.Estimated_Left_Merge_Rows} rows")
+
+
+def export_report(report: pd.DataFrame, output_file: pathlib.Path):
+    """Export the report to CSV file with file lock handling."""
+    print(f"Exporting join cardinality profile to: {output_file}")
+
+    # Handle file lock with retry mechanism
+    while True:
+        try:
+            report.to_csv(output_file, index=False, encoding='utf-8')
+            break
+        except PermissionError:
+            print(f"ERROR: File is locked: {output_file}")
+            print("Please close the file in Excel and press Enter to retry...")
+            input("Press Enter when ready: ")
+            continue
+        except Exception:
+            print(f"ERROR: Could not write file: {output_file}")
+            sys.exit(1)
+    write_columnar(report, output_file)
+
+    print(f"  SUCCESS: Exported {len(report)} relationship profiles")
+
+
+def main():
+    """Main execution function."""
+    print("=" * 70)
+    print("JOIN CARDINALITY PROFILE")
+    print("=" * 70)
+
+    profiles = []
+    for join in profiled_joins():
+        profile = profile_relationship(join)
+        if profile is not None:
+            profiles.append(profile)
+
+    if not profiles:
+        print("ERROR: None of the profiled tables could be loaded")
+        sys.exit(1)
+
+    report = pd.DataFrame(profiles)
+    print()
+    print_report(report)
+    print()
+    export_report(report, OUTPUT_FILE)
+
+    print("\n" + "=" * 70)
+    print("JOIN CARDINALITY PROFILE COMPLETED SUCCESSFULLY")
+    print(f"Output: {OUTPUT_FILE}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,53 +3,178 @@ Purpose: Expand regulatory_objective__rim.csv with registration information thro
 Process: Load regulatory objectives, merge with registration relationships, then merge with registration details
 Success Criteria: Output CSV contains all original regulatory objective data plus registration_number, registration_number__rim, state__v, and maintain_registration__c
 Logic: Left outer merge regulatory_objective__rim -> registration_regulatory_objective__rim -> registration__rim
+Key cardinalities and the output size are computed before merging; an output of more than 10 rows per
+regulatory objective is reported as a warning, or stops the run when --max-expansion is given. With
+--aggregate, the registrations of each RO are joined into one '|'-delimited field per column instead
+of one row per registration.
 """
 
+import argparse
+import pathlib
 import pandas as pd
 import sys
+import migration_config
+from columnar_io import write_columnar
+from join_profile import estimate_left_merge_rows, profile_join
+
+REGISTRATION_JOIN_FILE = pathlib.Path("02 Loader sheets/registration_regulatory_objective__rim.csv")
+REGISTRATION_COLUMNS = ['id', 'registration_number__rim', 'state__v', 'maintain_registration__c']
+OUTPUT_FILE = "08 - Create Loader with REG Info.csv"
+
+# Warn when the merged output would exceed this many rows per regulatory objective row
+WARNING_EXPANSION = 10.0
+AGGREGATE_DELIMITER = '|'
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Create the regulatory objective loader with registration info")
+    parser.add_argument('--aggregate', action='store_true',
+                        help="One row per regulatory objective, with multiple registrations joined by '|'")
+    parser.add_argument('--max-expansion', type=float,
+                        help=f"Stop when the output would exceed this many rows per input row "
+                             f"(default: warn above {WARNING_EXPANSION:g} and continue)")
+    return parser.parse_args()
+
+
+def load_registrations(file_path):
+    """Load only the registration columns used by the merge."""
+    header = pd.read_csv(file_path, encoding='utf-8', nrows=0).columns
+    missing = [col for col in REGISTRATION_COLUMNS if col not in header]
+    if missing:
+        raise ValueError(f"Column(s) {', '.join(missing)} not found in {file_path}")
+    return pd.read_csv(file_path, encoding='utf-8', usecols=REGISTRATION_COLUMNS)[REGISTRATION_COLUMNS]
+
+
+def report_cardinality(description, parent_keys, child_keys):
+    """Print the fan-out of one merge key, computed from key counts only."""
+    profile = profile_join(parent_keys, child_keys)
+    print(f"  {description}: {profile['Parent_Keys']} keys, fan-out p50 {profile['P50_Fan_Out']:g}, "
+          f"p99 {profile['P99_Fan_Out']:g}, max {profile['Max_Fan_Out']} ({profile['Max_Fan_Out_Key']}), "
+          f"{profile['Childless_Parent_Keys']} without match, {profile['Duplicate_Parent_Keys']} duplicated")
+
+
+def estimate_output_rows(regulatory_obj, reg_reg_obj, registrations):
+    """Rows after each of the two merges, from key counts (missing keys match each other, as in pandas)."""
+    step1_rows = estimate_left_merge_rows(regulatory_obj['external_id__v'], reg_reg_obj['regulatory_objective__rim'])
+
+    # Each relationship row appears once per regulatory objective row with its key
+    ro_counts = regulatory_obj['external_id__v'].value_counts(dropna=False)
+    link_weights = pd.Series(
+        ro_counts.reindex(reg_reg_obj['regulatory_objective__rim'].to_numpy()).fillna(0).to_numpy(dtype='int64'),
+        index=reg_reg_obj.index
+    )
+    step1_numbers = link_weights.groupby(reg_reg_obj['registration_number'], dropna=False).sum()
+
+    # Regulatory objectives without a relationship carry a missing registration_number into the second merge
+    unmatched_rows = step1_rows - int(step1_numbers.sum())
+    registration_counts = registrations['id'].value_counts(dropna=False)
+    matches = registration_counts.reindex(step1_numbers.index, fill_value=0).clip(lower=1)
+    step2_rows = int((step1_numbers * matches).sum()) + unmatched_rows * max(int(registrations['id'].isna().sum()), 1)
+
+    return step1_rows, step2_rows
+
+
+def aggregate_registrations(reg_reg_obj, registrations):
+    """One row per regulatory objective key, with every relationship and registration column '|'-joined."""
+    links = pd.merge(
+        reg_reg_obj,
+        registrations,
+        left_on='registration_number',
+        right_on='id',
+        how='left'
+    )
+    keys = links['regulatory_objective__rim']
+    value_columns = [col for col in links.columns if col != 'regulatory_objective__rim']
+
+    # Values of one RO stay in relationship order, so the nth entry of every field belongs together
+    values = links[value_columns].astype(object).where(links[value_columns].notna(), '').astype(str)
+    aggregated = values.groupby(keys, sort=False).agg(AGGREGATE_DELIMITER.join)
+    aggregated.insert(0, 'registration_count', keys.value_counts().reindex(aggregated.index))
+    return aggregated.reset_index()
+
+
+def count_with_registration_info(final_result, aggregated):
+    """Rows with at least one registration_number (aggregated rows hold '' for missing ones)."""
+    if aggregated:
+        numbers = final_result['registration_number'].fillna('').str.replace(AGGREGATE_DELIMITER, '', regex=False)
+        return int((numbers.str.strip() != '').sum())
+    return int(final_result['registration_number'].notna().sum())
+
 
 def main():
+    args = parse_arguments()
     try:
         # Load source files with UTF-8 encoding
         print("Loading regulatory_objective__rim.csv...")
-        regulatory_obj = pd.read_csv(r"02 Loader sheets\regulatory_objective__rim.csv", encoding='utf-8')
-        
+        regulatory_obj = pd.read_csv(migration_config.LOADER_CREATE_FILE, encoding='utf-8')
+
         print("Loading registration_regulatory_objective__rim.csv...")
-        reg_reg_obj = pd.read_csv(r"02 Loader sheets\registration_regulatory_objective__rim.csv", encoding='utf-8')
-        
+        reg_reg_obj = pd.read_csv(REGISTRATION_JOIN_FILE, encoding='utf-8')
+
         print("Loading registration__rim.csv...")
-        registrations = pd.read_csv(r"C:\00 GRAVITY\01 RIM and MVS DBs (Extract and Enrich)\output\RIM PROD RAW\registration__rim.csv", encoding='utf-8')
-        
-        # First merge: regulatory_objective__rim with registration_regulatory_objective__rim
-        print("Performing first merge: regulatory objectives with registration relationships...")
-        merged_step1 = pd.merge(
-            regulatory_obj,
-            reg_reg_obj,
-            left_on='external_id__v',
-            right_on='regulatory_objective__rim',
-            how='left'
-        )
-        
-        # Second merge: result with registration__rim
-        print("Performing second merge: adding registration details...")
-        final_result = pd.merge(
-            merged_step1,
-            registrations[['id', 'registration_number__rim', 'state__v', 'maintain_registration__c']],
-            left_on='registration_number',
-            right_on='id',
-            how='left'
-        )
-        
+        registrations = load_registrations(migration_config.RIM_REGISTRATION_FILE)
+
+        # Size the merges from key counts before building them
+        print("Checking merge key cardinality...")
+        report_cardinality("Regulatory objective -> relationships", regulatory_obj['external_id__v'], reg_reg_obj['regulatory_objective__rim'])
+        report_cardinality("Relationship -> registrations", reg_reg_obj['registration_number'], registrations['id'])
+        step1_rows, step2_rows = estimate_output_rows(regulatory_obj, reg_reg_obj, registrations)
+        print(f"  Estimated rows: {len(regulatory_obj)} -> {step1_rows} (first merge) -> {step2_rows} (second merge)")
+
+        if args.aggregate:
+            print("Aggregating registrations per regulatory objective...")
+            final_result = pd.merge(
+                regulatory_obj,
+                aggregate_registrations(reg_reg_obj, registrations),
+                left_on='external_id__v',
+                right_on='regulatory_objective__rim',
+                how='left'
+            )
+            final_result['registration_count'] = final_result['registration_count'].fillna(0).astype(int)
+        else:
+            expansion = WARNING_EXPANSION if args.max_expansion is None else args.max_expansion
+            if step2_rows > len(regulatory_obj) * expansion:
+                if args.max_expansion is not None:
+                    print(f"ERROR: Merged output would have {step2_rows} rows, more than {expansion:g}x "
+                          f"the {len(regulatory_obj)} regulatory objectives")
+                    print("Check the duplicated keys above, raise --max-expansion, or use --aggregate")
+                    sys.exit(1)
+                print(f"WARNING: Merged output will have {step2_rows} rows, more than {expansion:g}x "
+                      f"the {len(regulatory_obj)} regulatory objectives")
+                print("Check the duplicated keys above, or use --aggregate for one row per regulatory objective")
+
+            # First merge: regulatory_objective__rim with registration_regulatory_objective__rim
+            print("Performing first merge: regulatory objectives with registration relationships...")
+            merged_step1 = pd.merge(
+                regulatory_obj,
+                reg_reg_obj,
+                left_on='external_id__v',
+                right_on='regulatory_objective__rim',
+                how='left'
+            )
+
+            # Second merge: result with registration__rim
+            print("Performing second merge: adding registration details...")
+            final_result = pd.merge(
+                merged_step1,
+                registrations,
+                left_on='registration_number',
+                right_on='id',
+                how='left'
+            )
+
         # Save result with UTF-8 encoding
-        output_file = "08 - Create Loader with REG Info.csv"
+        output_file = OUTPUT_FILE
         print(f"Saving expanded loader sheet to {output_file}...")
         final_result.to_csv(output_file, index=False, encoding='utf-8')
-        
+        write_columnar(final_result, output_file)
+
         print(f"SUCCESS: Created {output_file}")
         print(f"Original records: {len(regulatory_obj)}")
         print(f"Final records: {len(final_result)}")
-        print(f"Records with registration info: {final_result['registration_number'].notna().sum()}")
-        
+        print(f"Records with registration info: {count_with_registration_info(final_result, args.aggregate)}")
+
     except Exception as e:
         print(f"ERROR: {str(e)}")
         sys.exit(1)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark the hash-partitioned MVS aggregation of script 03
+Builds a synthetic MVS table and lookups, runs the aggregation with 1/2/4/8 workers,
+checks the output is byte-identical to the single-process run and reports the timings.
+"""
+
+import importlib.util
+import pathlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+
+def load_script_03():
+    """Import script 03 as a module (its file name contains spaces)."""
+    spec = importlib.util.spec_from_file_location(
+        "compare_unique_ids", REPO_DIR / "03 - Compare Unique IDs and Green Light.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["compare_unique_ids"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_synthetic_data(script, rows: int, unique_ids: int):
+    """Build a synthetic MVS frame and lookup tables."""
+    rng = np.random.default_rng(42)
+    ids = np.array([f"MVS-{i:07d}" for i in range(unique_ids)], dtype=object)
+
+    df = pd.DataFrame({
+        script.MVS_UNIQUE_ID_COL: ids[rng.integers(0, unique_ids, rows)],
+        script.MVS_OUT_OF_SCOPE_COL: rng.choice(['In Scope', 'Out of scope', 'in scope', 'Inscope'], rows),
+        script.MVS_GREEN_LIGHT_COL: rng.choice(['YES', 'NO', 'Yes', ''], rows),
+        script.MVS_MOLECULE_COL: rng.choice(['Levothyroxine sodium', 'Testosterone', 'Indometacin'], rows),
+        script.MVS_VALIDATION_DATE_COL: rng.choice(['01-02-2025', '15-09-2025', ''], rows),
+    })
+
+    rim_keys = ids[rng.choice(unique_ids, unique_ids // 2, replace=False)]
+    lookups = {
+        'rim_ids': {key: 1 for key in rim_keys},
+        'create_ids': {key: 1 for key in rim_keys[::3]},
+        'update_ids': {key: 2 for key in rim_keys[1::3]},
+        'create_greenlight': {key: 'YES' for key in rim_keys[::3]},
+        'update_greenlight': {key: 'NO' for key in rim_keys[1::3]},
+        'rim_greenlight': {key: 'true' for key in rim_keys},
+        'rim_product_family': {key: 'P1' for key in rim_keys},
+        'rim_greenlight_date': {key: '2025-02-01' for key in rim_keys},
+        'rim_additional_info': {key: '' for key in rim_keys},
+        'rim_record_id': {key: f"RO{i}" for i, key in enumerate(rim_keys)},
+    }
+    return df, lookups
+
+
+def run_benchmark(rows: int = 2_170_000, unique_ids: int = 500_000):
+    """Time the aggregation for each worker count."""
+    script = load_script_03()
+    df, lookups = build_synthetic_data(script, rows, unique_ids)
+    print(f"Synthetic MVS: {rows:,} rows, {unique_ids:,} Unique IDs")
+
+    start = time.perf_counter()
+    baseline = script.aggregate_mvs_data(df, lookups)
+    serial_seconds = time.perf_counter() - start
+    baseline = baseline.to_csv(index=False)
+    print(f"  single process: {serial_seconds:.2f}s")
+
+    for workers in [1, 2, 4, 8]:
+        start = time.perf_counter()
+        result = script.aggregate_mvs_data_parallel(df, lookups, workers)
+        seconds = time.perf_counter() - start
+
+        identical = result.to_csv(index=False) == baseline
+        print(f"  {workers} worker(s): {seconds:.2f}s  speedup x{serial_seconds / seconds:.2f}  identical={identical}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark the multi-process product matching of script 04
+Builds a synthetic 03 output with many distinct molecule/product pairs, evaluates
+them with 1/2/4/8 workers, checks the verdicts match the single-process run
+and reports the throughput per worker count.
+"""
+
+import importlib.util
+import pathlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+
+def load_script_04():
+    """Import script 04 as a module (its file name contains spaces)."""
+    spec = importlib.util.spec_from_file_location(
+        "product_data_comparison", REPO_DIR / "04 - Product Data comparison.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["product_data_comparison"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_synthetic_input(rows: int, molecules: int, products: int) -> pd.DataFrame:
+    """Build a synthetic script 03 output with generated molecule and product names."""
+    rng = np.random.default_rng(11)
+    stems = ['levothyroxine', 'remifentanil', 'testosterone', 'indometacin', 'sulfamethoxazole',
+             'trimethoprim', 'paracetamol', 'codeine', 'atracurium', 'amoxicillin']
+    salts = ['', ' sodium', ' hydrochloride', ' phosphate']
+
+    mvs_names = np.array([
+        f"{stems[i % len(stems)]}{i // len(stems)}{salts[i % len(salts)]} + {stems[(i * 7) % len(stems)]}"
+        for i in range(molecules)
+    ], dtype=object)
+    rim_names = np.array([
+        f"{stems[i % len(stems)]}{i // len(stems)}, {stems[(i * 3) % len(stems)]}"
+        for i in range(products)
+    ], dtype=object)
+
+    return pd.DataFrame({
+        'MVS_Unique_ID': [f"MVS-{i:07d}" for i in range(rows)],
+        'MVS_Molecule': mvs_names[rng.integers(0, molecules, rows)],
+        'RIM_Product_Name': rim_names[rng.integers(0, products, rows)],
+    })
+
+
+def run_benchmark(rows: int = 1_000_000, molecules: int = 5_000, products: int = 2_000):
+    """Time the pair evaluation for each worker count."""
+    script = load_script_04()
+    df = build_synthetic_input(rows, molecules, products)
+    script.configure_molecule_matcher(script.build_molecule_matcher(df['RIM_Product_Name'].unique()))
+    print(f"Synthetic input: {rows:,} rows")
+
+    baseline = None
+    serial_seconds = None
+    for workers in [1, 2, 4, 8]:
+        # Start every run from cold parser caches
+        script.configure_normalizer(script.MOLECULE_NORMALIZER)
+
+        start = time.perf_counter()
+        verdicts = script.match_distinct_pairs(df, workers).astype(str).tolist()
+        seconds = time.perf_counter() - start
+
+        if baseline is None:
+            baseline, serial_seconds = verdicts, seconds
+        identical = verdicts == baseline
+        print(f"  {workers} worker(s): {seconds:.2f}s  speedup x{serial_seconds / seconds:.2f}  identical={identical}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark the product comparison of script 04
+Builds a 2M-row synthetic 03 output, runs the previous row-by-row assembly
+(iterrows + row.to_dict + DataFrame from dicts) and the columnar stage,
+and checks both produce the same CSV.
+"""
+
+import importlib.util
+import pathlib
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+
+def load_script_04():
+    """Import script 04 as a module (its file name contains spaces)."""
+    spec = importlib.util.spec_from_file_location(
+        "product_data_comparison", REPO_DIR / "04 - Product Data comparison.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["product_data_comparison"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_synthetic_input(rows: int) -> pd.DataFrame:
+    """Build a synthetic script 03 output."""
+    rng = np.random.default_rng(7)
+    molecules = ['Levothyroxine sodium', 'Remifentanil Hydrochloride', 'Testosterone', 'Indometacin',
+                 'Sulfamethoxazole + Trimethoprim', 'Paracetamol/Codeine phosphate', None]
+    products = ['levothyroxine', 'remifentanil', 'indomethacin', 'sulphamethoxazole, trimethoprim',
+                'testosterone (decanoate, isocaproate, phenylpropionate, propionate)', 'paracetamol, codeine', None]
+    return pd.DataFrame({
+        'MVS_Unique_ID': [f"MVS-{i:07d}" for i in range(rows)],
+        'Out_of_Scope': rng.choice(['In Scope', 'Out of scope'], rows),
+        'Count_in_MVS': rng.integers(1, 5, rows),
+        'MVS_Molecule': rng.choice(np.array(molecules, dtype=object), rows),
+        'RIM_Product_Name': rng.choice(np.array(products, dtype=object), rows),
+    })
+
+
+def legacy_row_assembly(script, df: pd.DataFrame) -> pd.DataFrame:
+    """Previous implementation: one check and one dict per record."""
+    results = []
+    for _, row in df.iterrows():
+        result = row.to_dict()
+        result['Product_Match'] = script.check_product_match(row['MVS_Molecule'], row['RIM_Product_Name'])
+        results.append(result)
+    return pd.DataFrame(results)
+
+
+def run_benchmark(rows: int = 2_000_000):
+    """Time both implementations and compare their CSV output."""
+    script = load_script_04()
+    df = build_synthetic_input(rows)
+    print(f"Synthetic input: {rows:,} rows")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        legacy_file = pathlib.Path(temp_dir) / "legacy.csv"
+        columnar_file = pathlib.Path(temp_dir) / "columnar.csv"
+
+        start = time.perf_counter()
+        legacy = legacy_row_assembly(script, df.copy())
+        legacy.to_csv(legacy_file, index=False, encoding='utf-8')
+        legacy_seconds = time.perf_counter() - start
+        print(f"  row-by-row assembly: {legacy_seconds:.2f}s")
+
+        start = time.perf_counter()
+        columnar = df.copy()
+        columnar['Product_Match'] = script.match_distinct_pairs(columnar)
+        script.write_csv_in_chunks(columnar, columnar_file)
+        columnar_seconds = time.perf_counter() - start
+        print(f"  columnar assembly + chunked write: {columnar_seconds:.2f}s")
+
+        identical = legacy_file.read_bytes() == columnar_file.read_bytes()
+        print(f"  speedup x{legacy_seconds / columnar_seconds:.1f}  identical={identical}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark the join counting of script 06
+Builds 100k synthetic ROs and a 1M-row join file, counts joins per RO with one
+value_counts + lookup, and compares against the previous per-RO scan (count_joins).
+The per-RO scan is timed on a sample of ROs and extrapolated, since a full run
+is O(ROs x join rows).
+"""
+
+import importlib.util
+import pathlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+
+def load_script_06():
+    """Import script 06 as a module (its file name contains spaces)."""
+    spec = importlib.util.spec_from_file_location(
+        "analyse_joins_in_rim", REPO_DIR / "06 - Analyse joins in RIM.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["analyse_joins_in_rim"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_count_joins(target_id, df, column_name):
+    """Previous implementation: walk the whole join column for one RO id."""
+    if pd.isna(target_id) or not str(target_id).strip():
+        return 0
+
+    target_id_str = str(target_id).strip()
+    count = 0
+
+    for value in df[column_name]:
+        if pd.notna(value) and str(value).strip() == target_id_str:
+            count += 1
+
+    return count
+
+
+def build_synthetic_data(ros: int, join_rows: int):
+    """Build synthetic RO ids and a join file referencing them (with some blanks and orphans)."""
+    rng = np.random.default_rng(3)
+    ro_ids = pd.Series([f"V{i:08d}" for i in range(ros)], dtype=object)
+    join_values = np.array([f"V{i:08d}" for i in rng.integers(0, int(ros * 1.1), join_rows)], dtype=object)
+    join_values[rng.random(join_rows) < 0.01] = None
+    return ro_ids, pd.DataFrame({'regulatory_objective__v': join_values})
+
+
+def run_benchmark(ros: int = 100_000, join_rows: int = 1_000_000, sample: int = 50):
+    """Time both implementations and check they agree on the sample."""
+    script = load_script_06()
+    ro_ids, df_join = build_synthetic_data(ros, join_rows)
+    print(f"Synthetic data: {ros:,} ROs x {join_rows:,} join rows")
+
+    start = time.perf_counter()
+    counts = script.lookup_join_counts(ro_ids, script.join_counts(df_join, 'regulatory_objective__v'))
+    aggregated_seconds = time.perf_counter() - start
+    print(f"  value_counts + lookup (all ROs): {aggregated_seconds:.2f}s")
+
+    sample_ids = ro_ids.sample(sample, random_state=1)
+    start = time.perf_counter()
+    legacy = [legacy_count_joins(ro_id, df_join, 'regulatory_objective__v') for ro_id in sample_ids]
+    legacy_seconds = (time.perf_counter() - start) * ros / sample
+    print(f"  per-RO scan (extrapolated from {sample} ROs): {legacy_seconds:,.0f}s")
+
+    identical = legacy == counts[sample_ids.index].tolist()
+    print(f"  speedup x{legacy_seconds / aggregated_seconds:,.0f}  identical={identical}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark the columnar copies of the stage outputs
+Builds synthetic frames shaped like the intermediate files (01 MVS, 02 filtered RIM, 03 and 04
+comparisons, 06 fan-out), writes each as CSV and as the typed Parquet copy, then loads each file in
+a fresh process and reports the file size, load time and peak memory of both formats.
+Peak memory is the tracemalloc peak (Python and numpy buffers) plus the pyarrow pool peak.
+"""
+
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from columnar_io import columnar_path, read_columnar, write_columnar
+
+
+def random_ids(rng, prefix: str, size: int, distinct: int) -> np.ndarray:
+    """Random ids like 'MVS-0001234' drawn from a fixed number of distinct values."""
+    return np.array([f"{prefix}{i:07d}" for i in range(distinct)], dtype=object)[rng.integers(0, distinct, size)]
+
+
+def build_intermediates(rows: int):
+    """Synthetic frames with the column mix of each intermediate file."""
+    rng = np.random.default_rng(7)
+    molecules = ['Levothyroxine sodium', 'Testosterone', 'Indometacin', 'Remifentanil Hydrochloride', '']
+    dates = ['01-02-2025', '15-09-2025', '2025-02-01', '']
+
+    mvs = pd.DataFrame({
+        'Unique ID': random_ids(rng, 'MVS-', rows, rows // 4),
+        'Out of Scope': rng.choice(['Scope: In', 'Scope: Out', 'in scope', ''], rows),
+        'Green light\nYES/NO': rng.choice(['YES', 'NO', 'Yes', ''], rows),
+        'Molecule': rng.choice(molecules, rows),
+        'Implementation Rules': rng.choice(['Rule A', 'Rule B', ''], rows),
+        'Validation date': rng.choice(dates, rows),
+        'Source_File': rng.choice(['MVS_site_1.xlsx', 'MVS_site_2.xlsx'], rows),
+    })
+
+    rim = pd.DataFrame({
+        'id': random_ids(rng, 'V', rows // 2, rows // 2),
+        'external_id__c': random_ids(rng, 'MVS-', rows // 2, rows // 4),
+        'name__v': random_ids(rng, 'RO ', rows // 2, rows // 2),
+        'state__v': rng.choice(['active_state__v', 'inactive_state__v'], rows // 2),
+        'created_date__v': rng.choice(['2025-01-05T10:00:00.000Z', '2025-03-07T12:30:00.000Z'], rows // 2),
+        'modified_date__v': rng.choice(['2025-04-05T10:00:00.000Z', '2025-05-07T12:30:00.000Z'], rows // 2),
+        'green_light__c': rng.choice(['true', 'false', ''], rows // 2),
+        'product_family__c': rng.choice(['P1', 'P2', 'P3'], rows // 2),
+    })
+
+    comparison = pd.DataFrame({
+        'MVS_Unique_ID': random_ids(rng, 'MVS-', rows, rows),
+        'Out_of_Scope': mvs['Out of Scope'],
+        'In_Scope': rng.choice(['Yes', 'No'], rows),
+        'Count_in_MVS': rng.integers(1, 5, rows),
+        'Count_in_RO_Loader_Create': rng.integers(0, 2, rows),
+        'Count_in_RO_Loader_Update': rng.integers(0, 2, rows),
+        'Count_in_RIM': rng.integers(0, 3, rows),
+        'Found_in_RIM': rng.choice(['Yes', 'No'], rows),
+        'Green_Light_MVS': mvs['Green light\nYES/NO'],
+        'MVS_Validation_Date': mvs['Validation date'],
+        'Greenlight_RIM': rng.choice(['true', 'false', ''], rows),
+        'RIM_Record_ID': random_ids(rng, 'V', rows, rows // 2),
+        'MVS_Molecule': mvs['Molecule'],
+        'RIM_Product_Family': rng.choice(['P1', 'P2', 'P3', ''], rows),
+        'RIM_Product_Name': rng.choice(molecules, rows),
+        'Greenlight_Consistency': rng.choice(['Consistent (all YES)', 'Inconsistent: MVS vs RIM'], rows),
+    })
+
+    product = comparison.assign(Product_Match=rng.choice(['TRUE', 'FALSE', ''], rows))
+
+    fan_out = pd.DataFrame({
+        'Wave': rng.choice(['Wave 1', 'Wave 2'], rows // 2),
+        'RO_External_ID': random_ids(rng, 'EXT-', rows // 2, rows // 2),
+        'Loader_Registrations': rng.integers(0, 4, rows // 2),
+        'RIM_Registrations': rng.integers(0, 4, rows // 2),
+        'Loader_Drug_Products': rng.integers(0, 3, rows // 2),
+        'RIM_Drug_Products': rng.integers(0, 3, rows // 2),
+        'Mismatched_Paths': rng.choice(['', 'Registrations', 'Drug_Products'], rows // 2),
+    })
+
+    return {
+        '01 - Append MVS': mvs,
+        '02 - Filter RIM on migration data': rim,
+        '03 - Compare Unique IDs and Green Light': comparison,
+        '04 - Product Data comparison': product,
+        '06 - Relationship fan-out': fan_out,
+    }
+
+
+def load_file(file_format: str, path: str) -> pd.DataFrame:
+    """Load a file the way the stages do."""
+    if file_format == 'csv':
+        return pd.read_csv(path, encoding='utf-8')
+    return read_columnar(pathlib.Path(path))
+
+
+def measure_load(measure: str, file_format: str, path: str):
+    """Load one file in this (fresh) process and print the load seconds or the peak bytes."""
+    if measure == 'time':
+        start = time.perf_counter()
+        load_file(file_format, path)
+        print(time.perf_counter() - start)
+        return
+
+    import tracemalloc
+
+    import pyarrow as pa
+
+    # Timed separately: tracing slows down the many small allocations of the CSV parser
+    tracemalloc.start()
+    load_file(file_format, path)
+    print(tracemalloc.get_traced_memory()[1] + pa.default_memory_pool().max_memory())
+
+
+def load_in_subprocess(measure: str, file_format: str, path: pathlib.Path) -> float:
+    """Load seconds ('time') or peak bytes ('memory') of loading a file in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, __file__, '--measure', measure, file_format, str(path)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output)
+
+
+def measure_format(file_format: str, path: pathlib.Path):
+    """Load seconds and peak bytes of one file."""
+    return load_in_subprocess('time', file_format, path), load_in_subprocess('memory', file_format, path)
+
+
+def run_benchmark(rows: int = 500_000):
+    """Write every intermediate in both formats and compare size, load time and peak memory."""
+    print(f"Synthetic intermediates: {rows:,} MVS rows")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, df in build_intermediates(rows).items():
+            csv_file = pathlib.Path(temp_dir) / f"{name}.csv"
+            df.to_csv(csv_file, index=False, encoding='utf-8')
+            write_columnar(df, csv_file)
+            parquet_file = columnar_path(csv_file)
+
+            csv_seconds, csv_peak = measure_format('csv', csv_file)
+            parquet_seconds, parquet_peak = measure_format('parquet', parquet_file)
+
+            print(f"\n{name} ({len(df):,} rows x {len(df.columns)} columns)")
+            print(f"  CSV:     {csv_file.stat().st_size / 2**20:7.1f} MB  load {csv_seconds:6.2f}s  "
+                  f"peak {csv_peak / 2**20:7.1f} MB")
+            print(f"  Parquet: {parquet_file.stat().st_size / 2**20:7.1f} MB  load {parquet_seconds:6.2f}s  "
+                  f"peak {parquet_peak / 2**20:7.1f} MB")
+            print(f"  speedup x{csv_seconds / parquet_seconds:.1f}, peak memory x{parquet_peak / csv_peak:.2f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == '--measure':
+        measure_load(sys.argv[2], sys.argv[3], sys.argv[4])
+    else:
+        run_benchmark()
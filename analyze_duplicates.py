@@ -1,24 +1,25 @@
-import pandas as pd
+"""Duplicate MVS IDs among the In Scope rows of the script 03 output."""
 
-# Read the CSV file
-df = pd.read_csv('.Archive VAL RUN/03 - Compare Unique IDs and Green Light.csv')
+import pathlib
+from columnar_io import read_stage_output, stage_output_exists
+from scope_classification import in_scope_mask
+
+OUTPUT_FILE = pathlib.Path('03 - Compare Unique IDs and Green Light.csv')
+ARCHIVE_FILE = pathlib.Path('.Archive VAL RUN/03 - Compare Unique IDs and Green Light.csv')
+
+# Read the current script 03 output (typed columnar copy if available), else the archived run
+input_file = OUTPUT_FILE if stage_output_exists(OUTPUT_FILE) else ARCHIVE_FILE
+print(f'Input: {input_file}')
+df = read_stage_output(input_file)
 
 print('='*70)
 print('IN SCOPE - DUPLICATE ANALYSIS')
 print('='*70)
 print()
 
-# Find all In Scope variations
-in_scope_variations = []
-for value in df['Out_of_Scope'].unique():
-    if pd.notna(value):
-        value_lower = str(value).lower()
-        if 'in' in value_lower and 'scope' in value_lower and 'out' not in value_lower:
-            in_scope_variations.append(str(value))
-
-# Filter for all In Scope variations
-in_scope_mask = df['Out_of_Scope'].isin(in_scope_variations)
-in_scope_df = df[in_scope_mask]
+# Filter with the In_Scope flag from script 03, or its rule when the output has no such column
+in_scope_rows = in_scope_mask(df)
+in_scope_df = df[in_scope_rows]
 
 print(f'Total "In Scope" records: {len(in_scope_df):,}')
 print(f'Total UNIQUE MVS_Unique_IDs: {in_scope_df["MVS_Unique_ID"].nunique():,}')
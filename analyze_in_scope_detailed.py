@@ -1,20 +1,25 @@
-import pandas as pd
+"""Detailed In Scope report (variations, unique IDs, RIM coverage) for the script 03 output."""
 
-# Read the CSV file
-df = pd.read_csv('.Archive VAL RUN/03 - Compare Unique IDs and Green Light.csv')
+import pathlib
+from columnar_io import read_stage_output, stage_output_exists
+from scope_classification import in_scope_mask
+
+OUTPUT_FILE = pathlib.Path('03 - Compare Unique IDs and Green Light.csv')
+ARCHIVE_FILE = pathlib.Path('.Archive VAL RUN/03 - Compare Unique IDs and Green Light.csv')
+
+# Read the current script 03 output (typed columnar copy if available), else the archived run
+input_file = OUTPUT_FILE if stage_output_exists(OUTPUT_FILE) else ARCHIVE_FILE
+print(f'Input: {input_file}')
+df = read_stage_output(input_file)
 
 print('='*70)
 print('IN SCOPE ANALYSIS - DETAILED REPORT')
 print('='*70)
 print()
 
-# Find all variations that contain 'scope' and 'in' (case-insensitive)
-in_scope_variations = []
-for value in df['Out_of_Scope'].unique():
-    if pd.notna(value):
-        value_lower = str(value).lower()
-        if 'in' in value_lower and 'scope' in value_lower and 'out' not in value_lower:
-            in_scope_variations.append(str(value))
+# In_Scope flag from script 03, or its rule when the output has no such column
+in_scope_rows = in_scope_mask(df)
+in_scope_variations = [str(value) for value in df.loc[in_scope_rows, 'Out_of_Scope'].dropna().unique()]
 
 print('All "In Scope" variations found:')
 print('-' * 70)
@@ -28,9 +33,8 @@ print('-' * 70)
 print(f'  TOTAL: {total_records:,} records')
 print()
 
-# Filter for all In Scope variations
-in_scope_mask = df['Out_of_Scope'].isin(in_scope_variations)
-in_scope_df = df[in_scope_mask]
+# Filter for all In Scope records
+in_scope_df = df[in_scope_rows]
 
 # Count unique IDs
 unique_in_scope_ids = in_scope_df['MVS_Unique_ID'].nunique()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Columnar IO
+Writes typed Parquet copies of stage outputs next to the user-facing CSV files, with an
+explicit schema and zstd compression; the CSV files are kept as the export format.
+Downstream scripts read the Parquet copy (memory-mapped) when it is up to date and fall
+back to the CSV.
+Large CSV inputs can also be parsed once into a Parquet cache keyed by their content hash.
+Both readers return the in-process copy from dataset_registry when stages share a process.
+"""
+
+import hashlib
+import os
+import pathlib
+import tempfile
+from typing import Callable, Dict, List, Optional, Union
+
+import pandas as pd
+
+from dataset_registry import is_published, lookup_dataset, remember_dataset
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+CACHE_DIR = pathlib.Path(".pipeline_cache")
+COLUMNAR_COMPRESSION = "zstd"
+# Values pandas reads back from a CSV as missing (its default na_values)
+CSV_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                 '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def columnar_path(csv_path: pathlib.Path) -> pathlib.Path:
+    """Get the Parquet path that sits alongside a CSV output."""
+    return pathlib.Path(csv_path).with_suffix('.parquet')
+
+
+def is_text_column(values: pd.Series) -> bool:
+    """Check whether a column is stored as text (string or object dtype)."""
+    return values.dtype == object or (pd.api.types.is_string_dtype(values.dtype)
+                                      and not isinstance(values.dtype, pd.CategoricalDtype))
+
+
+def columnar_schema(df: pd.DataFrame) -> "pa.Schema":
+    """
+    Explicit Parquet schema for a stage output: text and object columns (mixed values included) as string,
+    categoricals as dictionary-encoded string, numbers, booleans and dates as their own types.
+    """
+    fields = []
+    for name, values in df.items():
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories.to_series()
+            value_type = pa.string() if is_text_column(categories) else pa.Array.from_pandas(categories.iloc[:0]).type
+            arrow_type = pa.dictionary(pa.int32(), value_type)
+        elif is_text_column(values):
+            arrow_type = pa.string()
+        else:
+            arrow_type = pa.Array.from_pandas(values.iloc[:0]).type
+        fields.append(pa.field(str(name), arrow_type))
+    return pa.schema(fields)
+
+
+def as_text(values: pd.Series) -> pd.Series:
+    """Text form of an object column that mixes strings with other values (as the CSV would show them)."""
+    if values.dtype != object or pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        return values
+    return values.map(_value_as_text)
+
+
+def _value_as_text(value):
+    """One value as the CSV writer shows it; strings and missing values are kept."""
+    # Lists (e.g. multi-value API fields) are not scalars, so pd.isna() would test each element
+    if isinstance(value, str) or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return value
+    return str(value)
+
+
+def write_columnar(df: pd.DataFrame, csv_path: pathlib.Path) -> Optional[pathlib.Path]:
+    """Write a typed, compressed Parquet copy of a stage output. Returns None if pyarrow is not installed."""
+    if not PARQUET_AVAILABLE:
+        print("  NOTE: pyarrow not installed - skipping columnar output")
+        return None
+
+    # Parquet columns are keyed by name, so duplicate names would silently collapse into one column
+    names = pd.Series([str(name) for name in df.columns])
+    if names.duplicated().any():
+        duplicates = sorted(set(names[names.duplicated()]))
+        raise ValueError(f"Duplicate column names in {csv_path}: {', '.join(duplicates)}")
+
+    schema = columnar_schema(df)
+    columns = {str(name): as_text(values) if schema.field(str(name)).type == pa.string() else values
+               for name, values in df.items()}
+    table = pa.Table.from_pandas(pd.DataFrame(columns), schema=schema, preserve_index=False)
+
+    parquet_path = columnar_path(csv_path)
+    pq.write_table(table, parquet_path, compression=COLUMNAR_COMPRESSION)
+    print(f"  Columnar copy: {parquet_path}")
+    return parquet_path
+
+
+def read_columnar(parquet_path: pathlib.Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a Parquet file (or some of its columns) through a memory map instead of buffered reads."""
+    return pd.read_parquet(parquet_path, columns=columns, memory_map=True)
+
+
+def columnar_text_columns(csv_path: pathlib.Path) -> List[str]:
+    """Columns stored as plain strings in the Parquet copy of a stage output."""
+    schema = pq.read_schema(columnar_path(csv_path))
+    return [field.name for field in schema if field.type in (pa.string(), pa.large_string())]
+
+
+def stage_output_columns(csv_path: pathlib.Path) -> List[str]:
+    """Column names of a stage output, from the Parquet schema when the copy is current, else the CSV header."""
+    if has_current_columnar(csv_path):
+        return pq.read_schema(columnar_path(csv_path)).names
+    return list(pd.read_csv(csv_path, encoding='utf-8', nrows=0).columns)
+
+
+def mask_csv_missing(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn the text values a CSV read treats as missing (empty text, 'N/A', ...) into missing values."""
+    text_columns = [name for name, values in df.items() if is_text_column(values)]
+    if not text_columns:
+        return df
+    masked = df.copy()
+    masked[text_columns] = df[text_columns].mask(df[text_columns].isin(CSV_NA_VALUES))
+    return masked
+
+
+def has_current_columnar(csv_path: pathlib.Path) -> bool:
+    """Check whether a Parquet copy exists and is not older than its CSV."""
+    csv_path = pathlib.Path(csv_path)
+    parquet_path = columnar_path(csv_path)
+
+    if not PARQUET_AVAILABLE or not parquet_path.exists():
+        return False
+
+    # A CSV saved after the Parquet copy (e.g. edited in Excel) takes precedence
+    if csv_path.exists() and csv_path.stat().st_mtime > parquet_path.stat().st_mtime:
+        return False
+
+    return True
+
+
+def stage_output_exists(csv_path: pathlib.Path) -> bool:
+    """Check whether a stage output exists in either format, or was published in this process."""
+    return is_published(csv_path) or pathlib.Path(csv_path).exists() or has_current_columnar(csv_path)
+
+
+def read_stage_output(csv_path: pathlib.Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a stage output, preferring the typed Parquet copy over the CSV."""
+    csv_path = pathlib.Path(csv_path)
+
+    shared = lookup_dataset(csv_path, columns)
+    if shared is not None:
+        return shared
+
+    if has_current_columnar(csv_path):
+        parquet_path = columnar_path(csv_path)
+        print(f"Reading columnar file: {parquet_path}")
+        return read_columnar(parquet_path, columns)
+
+    print(f"Reading CSV file: {csv_path}")
+    return pd.read_csv(csv_path, encoding='utf-8', usecols=columns)
+
+
+def file_hash(file_path: pathlib.Path) -> str:
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_cache_file(cache_file: pathlib.Path, write: Callable[[pathlib.Path], None]):
+    """
+    Write a cache file through a temporary file in the same directory and move it into place,
+    so a stage running at the same time never reads a partly written file.
+    """
+    handle, temp_name = tempfile.mkstemp(dir=cache_file.parent, prefix=f".{cache_file.stem}_", suffix=".tmp")
+    os.close(handle)
+    try:
+        write(pathlib.Path(temp_name))
+        try:
+            os.replace(temp_name, cache_file)
+        except PermissionError:
+            # Windows: another process has the file open; its copy has the same content key
+            if not cache_file.exists():
+                raise
+    finally:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+
+
+def read_csv_cached(csv_path: pathlib.Path, columns: List[str], dtype: Union[type, Dict[str, type]] = str,
+                    cache_dir: Optional[pathlib.Path] = CACHE_DIR) -> pd.DataFrame:
+    """
+    Read selected CSV columns with explicit dtypes, reusing a Parquet copy of the parsed
+    frame keyed by the CSV content hash, so unchanged inputs skip CSV parsing entirely.
+    Text reads of a stage output come straight from its columnar copy when it stores them as text.
+    """
+    csv_path = pathlib.Path(csv_path)
+    variant = repr(dtype)
+    shared = lookup_dataset(csv_path, columns, variant)
+    if shared is not None:
+        return shared
+
+    df = _read_csv_cached(csv_path, columns, dtype, cache_dir)
+    remember_dataset(csv_path, df, variant)
+    return df
+
+
+def _read_csv_cached(csv_path: pathlib.Path, columns: List[str], dtype: Union[type, Dict[str, type]],
+                     cache_dir: Optional[pathlib.Path]) -> pd.DataFrame:
+    """Parse the CSV projection, or load it from the stage's columnar copy or the Parquet cache."""
+    if dtype is str and has_current_columnar(csv_path) and set(columns) <= set(columnar_text_columns(csv_path)):
+        print(f"  Using columnar copy: {columnar_path(csv_path)}")
+        return mask_csv_missing(read_columnar(columnar_path(csv_path), columns))
+
+    if cache_dir is None or not PARQUET_AVAILABLE:
+        return pd.read_csv(csv_path, encoding='utf-8', usecols=columns, dtype=dtype)[columns]
+
+    # The cache key covers the file location, its content and the projection/dtypes it was parsed with,
+    # so files with the same name in different folders keep separate caches
+    location = hashlib.sha256(str(csv_path.resolve()).encode('utf-8')).hexdigest()[:8]
+    projection = hashlib.sha256(repr((columns, dtype)).encode('utf-8')).hexdigest()[:8]
+    cache_prefix = f"{csv_path.stem}_{location}_{projection}_"
+    cache_file = cache_dir / f"{cache_prefix}{file_hash(csv_path)[:16]}.parquet"
+
+    if cache_file.exists():
+        try:
+            df = read_columnar(cache_file)
+            print(f"  Using parsed cache: {cache_file}")
+            return df
+        except (OSError, ValueError) as e:  # ArrowInvalid is a ValueError
+            print(f"  WARNING: Ignoring unreadable parsed cache {cache_file} ({e})")
+
+    df = pd.read_csv(csv_path, encoding='utf-8', usecols=columns, dtype=dtype)[columns]
+
+    # Stages running in parallel may parse the same projection: write atomically, and only
+    # remove copies parsed from earlier versions of this same file
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    write_cache_file(cache_file, lambda path: df.to_parquet(path, index=False))
+    for stale_file in cache_dir.glob(f"{cache_prefix}*.parquet"):
+        if stale_file.name != cache_file.name:
+            try:
+                stale_file.unlink()
+            except FileNotFoundError:
+                pass
+    return df
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Dataset Registry
+In-process handoff of loaded tables between stages that run in the same Python process
+(run_pipeline.py --in-process). A stage publishes its result under the path of its CSV
+output and later stages get the frame back instead of parsing the file again; inputs read
+from disk are kept too, so a second stage reading the same file reuses the parsed copy.
+CSV outputs are written by one background thread so they stay off the critical path; their
+success messages are printed once the write has finished, and a locked file is retried a few
+times instead of prompting. When the registry is not enabled (a script run on its own) lookups
+miss and writes run inline.
+"""
+
+import pathlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+_enabled = False
+_lock = threading.Lock()
+# (resolved path, variant) -> (file signature when read from disk, frame)
+_datasets: Dict[Tuple[str, Optional[str]], Tuple[Optional[tuple], pd.DataFrame]] = {}
+_writer: Optional[ThreadPoolExecutor] = None
+# (resolved path, write, message to print once it succeeded)
+_pending_writes: List[Tuple[str, Future, Optional[str]]] = []
+_writer_thread = threading.local()
+
+# The background writer cannot prompt the user to close a locked file, so it retries instead
+BACKGROUND_WRITE_ATTEMPTS = 5
+BACKGROUND_RETRY_SECONDS = 3.0
+
+
+def enable_registry():
+    """Share datasets and write outputs in the background for the rest of this process."""
+    global _enabled, _writer
+    _enabled = True
+    if _writer is None:
+        # One writer thread: outputs are written in order, and file lock prompts never overlap
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="csv-writer")
+
+
+def registry_enabled() -> bool:
+    """Check whether stages share datasets in this process."""
+    return _enabled
+
+
+def _key(path: pathlib.Path) -> str:
+    """Registry key of a file path."""
+    return str(pathlib.Path(path).resolve())
+
+
+def _signature(path: pathlib.Path) -> Optional[tuple]:
+    """Size and modification time of a file, to notice it changed on disk."""
+    path = pathlib.Path(path)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def publish_dataset(path: pathlib.Path, df: pd.DataFrame):
+    """Make a stage result available to later stages under the path of its output file."""
+    if _enabled:
+        with _lock:
+            _datasets[(_key(path), None)] = (None, df)
+
+
+def remember_dataset(path: pathlib.Path, df: pd.DataFrame, variant: Optional[str] = None):
+    """Keep a frame parsed from a file (variant describes how it was parsed, e.g. its dtypes)."""
+    if _enabled:
+        with _lock:
+            _datasets[(_key(path), variant)] = (_signature(path), df)
+
+
+def lookup_dataset(path: pathlib.Path, columns: Optional[List[str]] = None,
+                   variant: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """A registered frame for a file (projected to columns), or None if there is none or the file changed since."""
+    if not _enabled:
+        return None
+
+    with _lock:
+        entry = _datasets.get((_key(path), variant))
+    if entry is None:
+        return None
+
+    signature, df = entry
+    if signature is not None and signature != _signature(path):
+        with _lock:
+            _datasets.pop((_key(path), variant), None)
+        return None
+
+    # Column selection returns a new frame, so callers cannot modify the shared one
+    columns = list(df.columns) if columns is None else list(columns)
+    if not set(columns) <= set(df.columns):
+        return None
+    print(f"  Using in-memory dataset: {pathlib.Path(path)}")
+    return df[columns]
+
+
+def is_published(path: pathlib.Path) -> bool:
+    """Check whether a stage published a dataset for this output path."""
+    with _lock:
+        return (_key(path), None) in _datasets
+
+
+def in_background_writer() -> bool:
+    """Check whether the caller runs on the background writer thread."""
+    return getattr(_writer_thread, 'active', False)
+
+
+def _write_on_writer_thread(write: Callable, *args):
+    """Run one writer, marking the thread so writers know they cannot prompt."""
+    _writer_thread.active = True
+    try:
+        write(*args)
+    finally:
+        _writer_thread.active = False
+
+
+def wait_for_unlock(path: pathlib.Path, attempt: int):
+    """
+    Called after attempt number `attempt` to write a file failed because it is locked: asks the user
+    to close the file, or on the background writer waits before retrying and gives up after a few attempts.
+    """
+    if not in_background_writer():
+        print("Please close the file in Excel and press Enter to retry...")
+        input("Press Enter when ready: ")
+        return
+
+    if attempt >= BACKGROUND_WRITE_ATTEMPTS:
+        raise PermissionError(f"{path} is still locked after {attempt} attempts - close it and rerun the stage")
+    print(f"  Retrying in {BACKGROUND_RETRY_SECONDS:g}s ({attempt}/{BACKGROUND_WRITE_ATTEMPTS})...")
+    time.sleep(BACKGROUND_RETRY_SECONDS)
+
+
+def write_in_background(path: pathlib.Path, write: Callable, *args, success_message: Optional[str] = None):
+    """
+    Run an output writer on the background thread when the registry is enabled, inline otherwise.
+    success_message is printed once the write has finished (by wait_for_writes for background writes).
+    """
+    if not _enabled:
+        write(*args)
+        if success_message:
+            print(success_message)
+        return
+
+    with _lock:
+        _pending_writes.append((_key(path), _writer.submit(_write_on_writer_thread, write, *args), success_message))
+    if success_message:
+        print(f"  Queued for background write: {pathlib.Path(path)}")
+
+
+def wait_for_writes(paths: Optional[List[pathlib.Path]] = None) -> List[str]:
+    """Wait for the pending writes of the given paths (default: all); returns the paths whose write failed."""
+    keys = None if paths is None else {_key(path) for path in paths}
+    with _lock:
+        waiting = [entry for entry in _pending_writes if keys is None or entry[0] in keys]
+
+    failed = []
+    for entry in waiting:
+        key, future, success_message = entry
+        try:
+            future.result()
+            if success_message:
+                print(success_message)
+        except BaseException as e:  # writers exit the process on failure (SystemExit)
+            print(f"ERROR: Background write failed for {key}: {e!r}")
+            failed.append(key)
+        with _lock:
+            _pending_writes.remove(entry)
+    return failed
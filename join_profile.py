@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Join Profile
+Cardinality profile of one key relationship (parent key -> child foreign key), computed
+from grouped counts over the full tables: fan-out histogram, percentiles, maximum,
+orphans on both sides and the row count a left merge would produce.
+"""
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+# Fan-out histogram buckets: lower bounds (inclusive) and labels
+HISTOGRAM_BOUNDS = [0, 1, 2, 3, 6, 11, 51]
+HISTOGRAM_LABELS = ["0", "1", "2", "3-5", "6-10", "11-50", "51+"]
+PERCENTILES = [50, 90, 99]
+
+
+def key_counts(keys: pd.Series) -> pd.Series:
+    """Rows per key value, ignoring blank and missing keys."""
+    cleaned = keys.dropna().astype(str).str.strip()
+    return cleaned[cleaned != ''].value_counts()
+
+
+def estimate_left_merge_rows(left_keys: pd.Series, right_keys: pd.Series) -> int:
+    """
+    Rows produced by a left merge on the keys exactly as given: each left row repeats once per
+    matching right row and is kept once without a match. Like pandas, missing keys match each other.
+    """
+    left_counts = left_keys.value_counts(dropna=False)
+    right_counts = right_keys.value_counts(dropna=False)
+    matches = right_counts.reindex(left_counts.index, fill_value=0).clip(lower=1)
+    return int((left_counts * matches).sum())
+
+
+def profile_join(parent_keys: pd.Series, child_keys: pd.Series) -> Dict[str, object]:
+    """
+    Profile a left merge of parent rows onto child rows by key. Fan-out is the number of
+    child rows per distinct parent key (0 for parents without children).
+    """
+    parent_counts = key_counts(parent_keys)
+    child_counts = key_counts(child_keys)
+
+    fan_out = child_counts.reindex(parent_counts.index, fill_value=0).astype('int64')
+    orphan_children = child_counts[~child_counts.index.isin(parent_counts.index)]
+
+    profile = {
+        'Parent_Rows': len(parent_keys),
+        'Parent_Keys': len(parent_counts),
+        'Duplicate_Parent_Keys': int((parent_counts > 1).sum()),
+        'Child_Rows': len(child_keys),
+        'Childless_Parent_Keys': int((fan_out == 0).sum()),
+        'Orphan_Child_Keys': len(orphan_children),
+        'Orphan_Child_Rows': int(orphan_children.sum()),
+        'Mean_Fan_Out': round(float(fan_out.mean()), 2) if len(fan_out) else 0.0,
+    }
+    for percentile in PERCENTILES:
+        profile[f'P{percentile}_Fan_Out'] = float(np.percentile(fan_out, percentile)) if len(fan_out) else 0.0
+    profile['Max_Fan_Out'] = int(fan_out.max()) if len(fan_out) else 0
+    profile['Max_Fan_Out_Key'] = fan_out.idxmax() if len(fan_out) else ''
+
+    buckets = np.searchsorted(HISTOGRAM_BOUNDS, fan_out.to_numpy(), side='right') - 1
+    histogram = np.bincount(buckets, minlength=len(HISTOGRAM_LABELS))
+    for label, count in zip(HISTOGRAM_LABELS, histogram):
+        profile[f'Fan_Out_{label}'] = int(count)
+
+    profile['Estimated_Left_Merge_Rows'] = estimate_left_merge_rows(parent_keys, child_keys)
+    return profile
@@ -12,6 +12,17 @@ All scripts should import and use these settings for consistency.
 MIGRATION_START_DATE = "2025-09-10T00:00:00.000Z"
 MIGRATION_END_DATE = "2025-09-18T23:59:59.000Z"
 
+# Migration waves: one named window per wave (same date format, bounds inclusive).
+# Waves must not overlap. A single-wave migration uses the date range above.
+# Example:
+# MIGRATION_WAVES = [
+#     {"name": "Wave 1", "start": "2025-09-10T00:00:00.000Z", "end": "2025-09-18T23:59:59.000Z"},
+#     {"name": "Wave 2", "start": "2025-10-20T00:00:00.000Z", "end": "2025-10-24T23:59:59.000Z"},
+# ]
+MIGRATION_WAVES = [
+    {"name": "Wave 1", "start": MIGRATION_START_DATE, "end": MIGRATION_END_DATE},
+]
+
 # Date column names in RIM data
 RIM_CREATED_DATE_COLUMN = "created_date__v"
 RIM_MODIFIED_DATE_COLUMN = "modified_date__v"
@@ -20,11 +31,16 @@ RIM_MODIFIED_DATE_COLUMN = "modified_date__v"
 RIM_FILTERED_FILE = "02 - Filter RIM on migration data.csv"
 LOADER_CREATE_FILE = "02 Loader sheets/regulatory_objective__rim.csv"
 LOADER_UPDATE_FILE = "02 Loader sheets/regulatory_objective_rim_update.csv"
+RIM_REGISTRATION_FILE = r"C:\00 GRAVITY\01 RIM and MVS DBs (Extract and Enrich)\output\RIM PROD RAW\registration__rim.csv"
 
 def get_migration_date_range():
     """Get migration date range as tuple."""
     return MIGRATION_START_DATE, MIGRATION_END_DATE
 
+def get_migration_waves():
+    """Get migration waves as a list of (name, start, end) tuples."""
+    return [(wave["name"], wave["start"], wave["end"]) for wave in MIGRATION_WAVES]
+
 def get_rim_date_columns():
     """Get RIM date column names as tuple."""
     return RIM_CREATED_DATE_COLUMN, RIM_MODIFIED_DATE_COLUMN
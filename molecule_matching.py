@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Molecule Matching
+Token-indexed matcher for RIM product molecules against MVS molecules.
+All known RIM molecule names are compiled once into an Aho-Corasick automaton
+(RIM molecule contained in an MVS molecule) and one joined text searched for each distinct
+MVS molecule (MVS molecule contained in a RIM molecule); the compatible RIM molecules of an
+MVS molecule are computed once and reused, so matching becomes a set lookup.
+"""
+
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+
+# Joins the RIM molecules into one searchable text; never part of a normalised molecule name
+MOLECULE_SEPARATOR = '\x00'
+
+
+class AhoCorasickAutomaton:
+    """Aho-Corasick automaton over a fixed set of patterns, reporting pattern ids found in a text."""
+
+    def __init__(self, patterns: List[str]):
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.failure: List[int] = [0]
+        self.outputs: List[List[int]] = [[]]
+
+        for pattern_id, pattern in enumerate(patterns):
+            self._add_pattern(pattern, pattern_id)
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern: str, pattern_id: int):
+        """Add one pattern to the trie."""
+        node = 0
+        for char in pattern:
+            next_node = self.transitions[node].get(char)
+            if next_node is None:
+                next_node = len(self.transitions)
+                self.transitions.append({})
+                self.failure.append(0)
+                self.outputs.append([])
+                self.transitions[node][char] = next_node
+            node = next_node
+        self.outputs[node].append(pattern_id)
+
+    def _build_failure_links(self):
+        """Link every node to its longest proper suffix in the trie (breadth first)."""
+        queue = deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.transitions[node].items():
+                queue.append(child)
+                fallback = self.failure[node]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.failure[fallback]
+                self.failure[child] = self.transitions[fallback].get(char, 0)
+                # Patterns ending at the suffix also end here
+                self.outputs[child] = self.outputs[child] + self.outputs[self.failure[child]]
+
+    def find_all(self, text: str) -> FrozenSet[int]:
+        """Return the ids of all patterns occurring anywhere in the text."""
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.transitions[node]:
+                node = self.failure[node]
+            node = self.transitions[node].get(char, 0)
+            if self.outputs[node]:
+                found.update(self.outputs[node])
+        return frozenset(found)
+
+
+class MoleculeMatcher:
+    """Matches normalised RIM molecules against sets of normalised MVS molecules."""
+
+    def __init__(self, rim_molecules: Iterable[str]):
+        self.molecules: List[str] = sorted({molecule for molecule in rim_molecules if molecule})
+        self.molecule_ids: Dict[str, int] = {molecule: index for index, molecule in enumerate(self.molecules)}
+
+        # RIM molecule in MVS molecule: scan MVS text for every known RIM molecule at once
+        self.automaton = AhoCorasickAutomaton(self.molecules)
+
+        # MVS molecule in RIM molecule: search one separator-joined text of all RIM molecules
+        self.joined_molecules = MOLECULE_SEPARATOR.join(self.molecules)
+        self.molecule_starts: List[int] = []
+        offset = 0
+        for molecule in self.molecules:
+            self.molecule_starts.append(offset)
+            offset += len(molecule) + len(MOLECULE_SEPARATOR)
+
+        self._compatible_cache: Dict[str, FrozenSet[int]] = {}
+
+    def containing_ids(self, mvs_molecule: str) -> FrozenSet[int]:
+        """Ids of known RIM molecules that contain one MVS molecule."""
+        if not mvs_molecule or MOLECULE_SEPARATOR in mvs_molecule:
+            return frozenset()
+
+        found = set()
+        position = self.joined_molecules.find(mvs_molecule)
+        while position != -1:
+            molecule_id = bisect_right(self.molecule_starts, position) - 1
+            found.add(molecule_id)
+            # One hit per RIM molecule is enough: continue from the next molecule
+            if molecule_id + 1 == len(self.molecule_starts):
+                break
+            position = self.joined_molecules.find(mvs_molecule, self.molecule_starts[molecule_id + 1])
+        return frozenset(found)
+
+    def compatible_ids(self, mvs_molecule: str) -> FrozenSet[int]:
+        """Ids of known RIM molecules that contain, or are contained in, one MVS molecule."""
+        compatible = self._compatible_cache.get(mvs_molecule)
+        if compatible is None:
+            compatible = self.automaton.find_all(mvs_molecule) | self.containing_ids(mvs_molecule)
+            self._compatible_cache[mvs_molecule] = compatible
+        return compatible
+
+    def matches(self, rim_molecule: str, mvs_molecules: FrozenSet[str]) -> bool:
+        """Check whether a RIM molecule is found in any MVS molecule (substring in either direction)."""
+        molecule_id: Optional[int] = self.molecule_ids.get(rim_molecule)
+        if molecule_id is None:
+            # Molecule not compiled into the index: fall back to direct substring tests
+            return any(rim_molecule in mvs_mol or mvs_mol in rim_molecule for mvs_mol in mvs_molecules)
+
+        return any(molecule_id in self.compatible_ids(mvs_mol) for mvs_mol in mvs_molecules)
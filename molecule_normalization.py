@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Molecule Normalization
+Synonym and salt-suffix tables for molecule names, loaded from the LoV Object Mapping workbook.
+The compiled tables are cached as a pickle keyed by the workbook hash, so the workbook
+is only parsed again when it changes.
+"""
+
+import hashlib
+import pathlib
+import pickle
+import re
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+from columnar_io import CACHE_DIR, file_hash, write_cache_file
+
+
+LOV_MAPPING_FILE = pathlib.Path("04 Transformation Maps/LoV Object Mapping.xlsx")
+
+# Bump when the normalisation logic below changes, to invalidate cached tables and verdicts
+NORMALIZATION_RULES_VERSION = "2"
+
+# Molecule sheet of the LoV workbook and its columns. These names are assumed, not checked against the
+# workbook: adjust them if loading reports the sheet or a column as missing (it lists what it found).
+# Other LoV sheets (dosage form, route, country, ...) are never read.
+LOV_MOLECULE_SHEET = "Molecule"
+LOV_SOURCE_COLUMN = "Source Value"
+LOV_TARGET_COLUMN = "Veeva Value Label"
+LOV_SALT_COLUMN = "Salt Suffix"
+
+# Built-in spelling variations, always applied on top of the workbook synonyms
+DEFAULT_SPELLING_VARIATIONS = {
+    'indometacin': 'indomethacin',
+    'tioguanine': 'thioguanine',
+    'sulfamethoxazole': 'sulphamethoxazole',
+}
+
+# Built-in salt suffixes, used when the workbook has no salt table
+DEFAULT_SALT_SUFFIXES = [
+    'hydrochloride', 'hcl', 'sodium', 'acetate', 'phosphate', 'base', 'hydrobromide', 'calcium', 'decanoate',
+]
+
+
+class MoleculeNormalizer:
+    """Compiled synonym map and salt-suffix regex shared by the MVS and RIM molecule parsers."""
+
+    def __init__(self, synonyms: Dict[str, str], salt_suffixes: Iterable[str], source_hash: str = "built-in"):
+        self.synonyms = dict(synonyms)
+        self.salt_suffixes = list(dict.fromkeys(salt_suffixes))
+        self.source_hash = source_hash
+
+        # One precompiled alternation, longest suffix first
+        alternation = "|".join(re.escape(suffix) for suffix in sorted(self.salt_suffixes, key=len, reverse=True))
+        self.salt_pattern = re.compile(rf"\s+({alternation})$") if alternation else None
+
+    @property
+    def version(self) -> str:
+        """Hash of the rules version and compiled tables, used to key cached verdicts."""
+        payload = repr((NORMALIZATION_RULES_VERSION, sorted(self.synonyms.items()), self.salt_suffixes))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def normalize(self, molecule: str) -> str:
+        """Lowercase a molecule name and map known spelling variations to the standard name."""
+        if not molecule:
+            return ""
+
+        molecule = molecule.lower().strip()
+        return self.synonyms.get(molecule, molecule)
+
+    def strip_salt(self, part: str) -> str:
+        """Remove one trailing salt suffix (e.g. ' hydrochloride') from a molecule name."""
+        if self.salt_pattern is None:
+            return part
+        return self.salt_pattern.sub('', part)
+
+
+def default_normalizer() -> MoleculeNormalizer:
+    """Normalizer built from the built-in tables only."""
+    return MoleculeNormalizer(DEFAULT_SPELLING_VARIATIONS, DEFAULT_SALT_SUFFIXES)
+
+
+def read_lov_tables(lov_file: pathlib.Path) -> tuple[Dict[str, str], list]:
+    """Read the synonym and salt tables from the molecule sheet of the LoV workbook."""
+    sheet_names = pd.ExcelFile(lov_file).sheet_names
+    if LOV_MOLECULE_SHEET not in sheet_names:
+        raise ValueError(f"sheet '{LOV_MOLECULE_SHEET}' not found (sheets: {', '.join(sheet_names)})")
+
+    sheet = pd.read_excel(lov_file, sheet_name=LOV_MOLECULE_SHEET, dtype=str)
+    sheet.columns = [str(column).strip() for column in sheet.columns]
+    missing = [column for column in (LOV_SOURCE_COLUMN, LOV_TARGET_COLUMN) if column not in sheet.columns]
+    if missing:
+        raise ValueError(f"column(s) {', '.join(missing)} not found in sheet '{LOV_MOLECULE_SHEET}' "
+                         f"(columns: {', '.join(sheet.columns)})")
+
+    synonyms = {}
+    pairs = sheet[[LOV_SOURCE_COLUMN, LOV_TARGET_COLUMN]].dropna()
+    for source, target in zip(pairs[LOV_SOURCE_COLUMN], pairs[LOV_TARGET_COLUMN]):
+        source, target = source.strip().lower(), target.strip().lower()
+        # First mapping wins when a source value appears more than once
+        if source and target and source != target and source not in synonyms:
+            synonyms[source] = target
+
+    salt_suffixes = []
+    if LOV_SALT_COLUMN in sheet.columns:
+        salt_suffixes = [value.strip().lower() for value in sheet[LOV_SALT_COLUMN].dropna() if value.strip()]
+    else:
+        print(f"  No '{LOV_SALT_COLUMN}' column in sheet '{LOV_MOLECULE_SHEET}', using built-in salt suffixes")
+
+    return synonyms, salt_suffixes
+
+
+def load_normalizer(lov_file: pathlib.Path = LOV_MAPPING_FILE, cache_dir: Optional[pathlib.Path] = CACHE_DIR) -> MoleculeNormalizer:
+    """Load the normalisation tables from the LoV workbook, using the cached copy if the workbook is unchanged."""
+    if not lov_file.exists():
+        print(f"WARNING: LoV mapping not found, using built-in molecule spellings: {lov_file}")
+        return default_normalizer()
+
+    workbook_hash = file_hash(lov_file)
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = cache_dir / f"lov_normalization_{NORMALIZATION_RULES_VERSION}_{workbook_hash[:16]}.pickle"
+        if cache_file.exists():
+            try:
+                with open(cache_file, 'rb') as handle:
+                    synonyms, salt_suffixes = pickle.load(handle)
+                print(f"Loaded cached LoV normalisation tables: {cache_file}")
+                return build_normalizer(synonyms, salt_suffixes, workbook_hash)
+            except (pickle.UnpicklingError, EOFError) as e:
+                print(f"WARNING: Ignoring unreadable LoV cache {cache_file} ({e}), rebuilding the tables")
+
+    print(f"Reading LoV mapping: {lov_file}")
+    try:
+        synonyms, salt_suffixes = read_lov_tables(lov_file)
+    except Exception as e:
+        print(f"WARNING: Could not read LoV mapping ({e}), using built-in molecule spellings")
+        return default_normalizer()
+
+    if cache_file is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        write_cache_file(cache_file, lambda path: save_lov_tables(path, synonyms, salt_suffixes))
+
+    return build_normalizer(synonyms, salt_suffixes, workbook_hash)
+
+
+def save_lov_tables(path: pathlib.Path, synonyms: Dict[str, str], salt_suffixes: list):
+    """Pickle the workbook tables."""
+    with open(path, 'wb') as handle:
+        pickle.dump((synonyms, salt_suffixes), handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def build_normalizer(synonyms: Dict[str, str], salt_suffixes: list, source_hash: str) -> MoleculeNormalizer:
+    """Combine workbook tables with the built-in defaults."""
+    # Built-in spellings take precedence; built-in salts apply when the workbook has none
+    merged_synonyms = {**synonyms, **DEFAULT_SPELLING_VARIATIONS}
+    normalizer = MoleculeNormalizer(merged_synonyms, salt_suffixes or DEFAULT_SALT_SUFFIXES, source_hash)
+    print(f"  Molecule synonyms: {len(normalizer.synonyms):,}, salt suffixes: {len(normalizer.salt_suffixes)}")
+    return normalizer
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Relationship Graph
+Declarative graph of the RIM objects linked to regulatory objectives (join tables and their
+foreign-key columns). Per-RO fan-out is computed for every path in the graph with hash joins,
+on both the loader sheets and the RIM extracts, so the two can be compared.
+Column names follow the Vault field names; adjust RELATIONSHIPS if an export differs.
+"""
+
+import pathlib
+from typing import Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+import migration_config
+from columnar_io import read_csv_cached
+
+
+LOADER_DIR = pathlib.Path("02 Loader sheets")
+RIM_DIR = pathlib.Path("03 Target RIM")
+LOADER_SIDE = "Loader"
+RIM_SIDE = "RIM"
+
+# Root object of every fan-out path
+REGULATORY_OBJECTIVE = "regulatory_objective"
+
+
+class Relationship(NamedTuple):
+    """One join table: each row links a parent object to a child object through two foreign-key columns."""
+    table: str
+    parent: str
+    parent_column: str
+    child: str
+    child_column: str
+
+
+RELATIONSHIPS = [
+    Relationship("registration_regulatory_objective__rim",
+                 REGULATORY_OBJECTIVE, "regulatory_objective__rim", "registration", "registration__rim"),
+    Relationship("regulatory_objective_drug_product__v",
+                 REGULATORY_OBJECTIVE, "regulatory_objective__v", "drug_product", "drug_product__v"),
+    Relationship("submission_regulatory_objective__v",
+                 REGULATORY_OBJECTIVE, "regulatory_objective__v", "submission", "submission__v"),
+    Relationship("submission_country__rim",
+                 "submission", "submission__v", "submission_country", "country__v"),
+    Relationship("submission_pharmaceutical_product__rim",
+                 "submission", "submission__v", "pharmaceutical_product", "pharmaceutical_product__rim"),
+]
+
+# Table and key column holding the records of each parent object, per side
+OBJECT_TABLES = {
+    REGULATORY_OBJECTIVE: {
+        LOADER_SIDE: (pathlib.Path(migration_config.LOADER_CREATE_FILE), "external_id__v"),
+        RIM_SIDE: (pathlib.Path(migration_config.RIM_FILTERED_FILE), "id"),
+    },
+    "submission": {
+        LOADER_SIDE: (LOADER_DIR / "submission__v.csv", "external_id__v"),
+        RIM_SIDE: (RIM_DIR / "submission__v_data.csv", "id"),
+    },
+}
+
+# Fan-out paths from a regulatory objective, as object sequences walked through RELATIONSHIPS
+FAN_OUT_PATHS = {
+    "Registrations": [REGULATORY_OBJECTIVE, "registration"],
+    "Drug_Products": [REGULATORY_OBJECTIVE, "drug_product"],
+    "Submissions": [REGULATORY_OBJECTIVE, "submission"],
+    "Submission_Countries": [REGULATORY_OBJECTIVE, "submission", "submission_country"],
+    "Submission_Pharmaceutical_Products": [REGULATORY_OBJECTIVE, "submission", "pharmaceutical_product"],
+}
+
+
+def relationship_between(parent: str, child: str) -> Relationship:
+    """Find the join table linking two objects."""
+    for relationship in RELATIONSHIPS:
+        if relationship.parent == parent and relationship.child == child:
+            return relationship
+    raise KeyError(f"No relationship declared from '{parent}' to '{child}'")
+
+
+def table_file(table: str, side: str) -> pathlib.Path:
+    """Location of a join table in the loader sheets or the RIM extracts."""
+    if side == LOADER_SIDE:
+        return LOADER_DIR / f"{table}.csv"
+    return RIM_DIR / f"{table}_data.csv"
+
+
+def read_key_columns(file_path: pathlib.Path, columns: List[str], description: str) -> Optional[pd.DataFrame]:
+    """Key columns of a table as stripped text (blank when missing); None if the file or a column is missing."""
+    if not file_path.exists():
+        print(f"  WARNING: {description} not found, skipping: {file_path}")
+        return None
+
+    header = pd.read_csv(file_path, encoding='utf-8', nrows=0).columns
+    missing = [col for col in columns if col not in header]
+    if missing:
+        print(f"  WARNING: {file_path} has no column(s) {', '.join(missing)}, skipping")
+        return None
+
+    frame = read_csv_cached(file_path, columns, dtype=str)
+    return frame.apply(lambda column: column.fillna('').str.strip())
+
+
+class RelationshipTables:
+    """Loads each join table once per side, with only the key columns, as stripped text."""
+
+    def __init__(self, side: str):
+        self.side = side
+        self._frames: Dict[tuple, Optional[pd.DataFrame]] = {}
+
+    def links(self, relationship: Relationship, with_child: bool) -> Optional[pd.DataFrame]:
+        """Parent (and optionally child) keys of every row of a join table; None if unavailable."""
+        columns = [relationship.parent_column] + ([relationship.child_column] if with_child else [])
+        cache_key = (relationship.table, tuple(columns))
+        if cache_key not in self._frames:
+            self._frames[cache_key] = self._load(relationship, columns)
+        return self._frames[cache_key]
+
+    def _load(self, relationship: Relationship, columns: List[str]) -> Optional[pd.DataFrame]:
+        """Read and clean the key columns of one join table."""
+        frame = read_key_columns(table_file(relationship.table, self.side), columns, f"{self.side} join table")
+        if frame is None:
+            return None
+        frame.columns = ['parent', 'child'][:len(columns)]
+        return frame[frame['parent'] != '']
+
+
+def path_fan_out(tables: RelationshipTables, objects: List[str]) -> Optional[pd.Series]:
+    """
+    Number of rows reached from each root key along a path of objects. Intermediate hops are
+    hash-joined; the last hop is reduced to a grouped count first, so only counts are joined.
+    """
+    hops = [relationship_between(parent, child) for parent, child in zip(objects, objects[1:])]
+
+    leaf = tables.links(hops[-1], with_child=False)
+    if leaf is None:
+        return None
+    counts = leaf.groupby('parent').size()
+
+    # Walk back from the leaf: each earlier hop sums the counts of the children it links to
+    for hop in reversed(hops[:-1]):
+        links = tables.links(hop, with_child=True)
+        if links is None:
+            return None
+        reached = links['child'].map(counts).fillna(0).astype('int64')
+        counts = reached.groupby(links['parent']).sum()
+
+    return counts
+
+
+def compute_fan_out(side: str, root_external_ids: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Per-RO fan-out for every path on one side. Root keys are mapped to RO external IDs
+    through root_external_ids when the side links by record id (RIM).
+    """
+    print(f"Computing {side} relationship fan-out...")
+    tables = RelationshipTables(side)
+
+    fan_out = {}
+    for name, objects in FAN_OUT_PATHS.items():
+        counts = path_fan_out(tables, objects)
+        if counts is None:
+            continue
+        if root_external_ids is not None:
+            counts = counts.groupby(counts.index.map(root_external_ids)).sum()
+        fan_out[f"{side}_{name}"] = counts
+        print(f"  {name}: {int(counts.sum())} rows across {len(counts)} ROs")
+
+    return pd.DataFrame(fan_out)
+
+
+def comparable_paths(loader_fan_out: pd.DataFrame, rim_fan_out: pd.DataFrame) -> List[str]:
+    """Fan-out paths that could be computed on both sides."""
+    return [name for name in FAN_OUT_PATHS
+            if f"{LOADER_SIDE}_{name}" in loader_fan_out.columns and f"{RIM_SIDE}_{name}" in rim_fan_out.columns]
+
+
+def compare_fan_out(ro_external_ids: pd.Series, loader_fan_out: pd.DataFrame, rim_fan_out: pd.DataFrame) -> pd.DataFrame:
+    """One row per RO: loader and RIM fan-out for every path, and the paths whose counts differ."""
+    ro_index = pd.Index(ro_external_ids.drop_duplicates(), name='RO_External_ID')
+    comparison = pd.DataFrame(index=ro_index)
+
+    compared = comparable_paths(loader_fan_out, rim_fan_out)
+    mismatches = {}
+    for name in FAN_OUT_PATHS:
+        loader_col, rim_col = f"{LOADER_SIDE}_{name}", f"{RIM_SIDE}_{name}"
+        for column, fan_out in ((loader_col, loader_fan_out), (rim_col, rim_fan_out)):
+            # Paths that could not be computed on a side stay blank rather than zero
+            if column in fan_out.columns:
+                comparison[column] = fan_out[column].reindex(ro_index).fillna(0).astype('int64')
+            else:
+                comparison[column] = pd.NA
+
+        if name in compared:
+            mismatches[name] = comparison[loader_col] != comparison[rim_col]
+
+    mismatched = pd.DataFrame(mismatches, index=ro_index)
+    comparison['Mismatched_Paths'] = [
+        '; '.join(mismatched.columns[row]) for row in mismatched.to_numpy(dtype=bool)
+    ]
+    return comparison.reset_index()
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Pipeline Runner
+Runs the numbered scripts in dependency order. Every stage declares its input and output
+files; a stage only reruns when the content hash of its inputs or of its code changed since
+its last successful run, or an output is missing. Stages whose dependencies are done run
+concurrently in separate processes. With --in-process, stages run one after another in this
+process and hand their tables over in memory (dataset_registry), while CSV outputs are written
+by a background thread.
+
+Usage:
+    python run_pipeline.py                 # run what changed
+    python run_pipeline.py --dry-run       # show what would run and why
+    python run_pipeline.py --jobs 4        # up to four stages at once
+    python run_pipeline.py --force 04      # rerun 04 (and whatever its new outputs change)
+    python run_pipeline.py --in-process    # one process, tables shared in memory between stages
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+import pathlib
+import runpy
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional, Set
+
+import migration_config
+import relationship_graph
+from columnar_io import CACHE_DIR, file_hash
+from dataset_registry import enable_registry, is_published, wait_for_writes
+from relationship_graph import LOADER_SIDE, RIM_SIDE
+
+
+PIPELINE_DIR = pathlib.Path(__file__).resolve().parent
+STATE_FILE = CACHE_DIR / "pipeline_state.json"
+LOG_DIR = CACHE_DIR / "logs"
+MISSING = "missing"
+
+
+class Stage(NamedTuple):
+    """One numbered script with the files it reads and writes (paths or glob patterns)."""
+    name: str
+    script: str
+    inputs: List[str]
+    outputs: List[str]
+    # Reads from outside the repository (e.g. the Vault API): only runs when forced or an output is missing
+    external: bool = False
+
+
+def relationship_graph_files() -> List[str]:
+    """Every join and object table read by the relationship graph, on both sides."""
+    files = [str(relationship_graph.table_file(relationship.table, side))
+             for relationship in relationship_graph.RELATIONSHIPS for side in (LOADER_SIDE, RIM_SIDE)]
+    files += [str(file_path) for tables in relationship_graph.OBJECT_TABLES.values() for file_path, _ in tables.values()]
+    return list(dict.fromkeys(files))
+
+
+def pipeline_stages() -> List[Stage]:
+    """The pipeline, in run order."""
+    graph_files = relationship_graph_files()
+    return [
+        Stage("01", "01 - Append MVS.py",
+              ["01 Source MVS/*.xlsx", "01 Source MVS/*.xls"],
+              ["01 - Append MVS.csv", "01 - Append MVS - Quality.txt"]),
+        Stage("02", "02 - Filter RIM on migration data.py",
+              [],
+              [migration_config.RIM_FILTERED_FILE, "02 - Filter RIM on migration data - Summary.txt"],
+              external=True),
+        Stage("03", "03 - Compare Unique IDs and Green Light.py",
+              ["03 Target RIM/regulatory_objective__rim.csv", "01 - Append MVS.csv", migration_config.LOADER_CREATE_FILE,
+               migration_config.LOADER_UPDATE_FILE, "03 Target RIM/product__v.csv"],
+              ["03 - Compare Unique IDs and Green Light.csv", "03 - Greenlight Consistency Matrix.csv",
+               "03 - Greenlight Mismatches.csv", "03 - Greenlight Date Unparseable.csv"]),
+        Stage("04", "04 - Product Data comparison.py",
+              ["03 - Compare Unique IDs and Green Light.csv", "03 Target RIM/product__v.csv",
+               "04 Transformation Maps/LoV Object Mapping.xlsx"],
+              ["04 - Product Data comparison.csv"]),
+        Stage("05", "05 - Compare RO loaders to RIM RO.py",
+              [migration_config.RIM_FILTERED_FILE, migration_config.LOADER_CREATE_FILE, migration_config.LOADER_UPDATE_FILE],
+              ["05 - Compare RO loaders to RIM RO.csv", "05 - Compare RO loaders to RIM RO - ID Discrepancies.csv"]),
+        Stage("06", "06 - Analyse joins in RIM.py",
+              [migration_config.RIM_FILTERED_FILE] + graph_files,
+              ["06 - Analyse joins in RIM - Joins for created ROs.csv", "06 - Analyse joins in RIM - Joins for updated ROs.csv",
+               "06 - Analyse joins in RIM - Relationship fan-out.csv"]),
+        Stage("07", "07 - Profile join cardinality.py",
+              graph_files + [migration_config.RIM_REGISTRATION_FILE],
+              ["07 - Profile join cardinality.csv"]),
+        Stage("08", "08 - Create Loader with REG Info.py",
+              [migration_config.LOADER_CREATE_FILE, "02 Loader sheets/registration_regulatory_objective__rim.csv",
+               migration_config.RIM_REGISTRATION_FILE],
+              ["08 - Create Loader with REG Info.csv"]),
+    ]
+
+
+def normalize_path(path: str) -> str:
+    """Comparable form of a declared path."""
+    return pathlib.Path(path).as_posix()
+
+
+def stage_dependencies(stages: List[Stage]) -> Dict[str, Set[str]]:
+    """Stages that produce at least one input of each stage."""
+    producers = {normalize_path(output): stage.name for stage in stages for output in stage.outputs}
+    return {
+        stage.name: {producers[normalize_path(path)] for path in stage.inputs
+                     if normalize_path(path) in producers and producers[normalize_path(path)] != stage.name}
+        for stage in stages
+    }
+
+
+def code_files(script: pathlib.Path) -> List[pathlib.Path]:
+    """The script and every local module it imports, directly or through other local modules."""
+    found = []
+    queue = [script]
+    while queue:
+        path = queue.pop()
+        if path in found or not path.exists():
+            continue
+        found.append(path)
+        tree = ast.parse(path.read_text(encoding='utf-8'))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            queue.extend(PIPELINE_DIR / f"{name.split('.')[0]}.py" for name in names)
+    return sorted(found)
+
+
+class InputHasher:
+    """Content hashes of input files, reusing the stored hash while size and modification time are unchanged."""
+
+    def __init__(self, known: Dict[str, list]):
+        self.known = known
+
+    def hash(self, path: pathlib.Path) -> str:
+        """Content hash of one file."""
+        stat = path.stat()
+        key = str(path)
+        cached = self.known.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = file_hash(path)
+        self.known[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def fingerprint(self, stage: Stage) -> Dict[str, str]:
+        """Hash of every input file and code file of a stage ('missing' for absent inputs)."""
+        hashes = {}
+        for pattern in stage.inputs:
+            if glob.has_magic(pattern):
+                for path in sorted(PIPELINE_DIR.glob(pattern)):
+                    hashes[path.relative_to(PIPELINE_DIR).as_posix()] = self.hash(path)
+            else:
+                path = PIPELINE_DIR / pattern
+                hashes[normalize_path(pattern)] = self.hash(path) if path.exists() else MISSING
+        for path in code_files(PIPELINE_DIR / stage.script):
+            hashes[path.relative_to(PIPELINE_DIR).as_posix()] = self.hash(path)
+        return hashes
+
+
+def load_state() -> dict:
+    """Load the fingerprints of the last successful stage runs."""
+    state_file = PIPELINE_DIR / STATE_FILE
+    if state_file.exists():
+        try:
+            with open(state_file, 'r', encoding='utf-8') as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            print(f"WARNING: Could not read pipeline state, all stages will run: {state_file}")
+    return {'stages': {}, 'hashes': {}}
+
+
+def save_state(state: dict):
+    """Save the stage fingerprints and file hashes."""
+    state_file = PIPELINE_DIR / STATE_FILE
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = state_file.with_suffix('.tmp')
+    with open(temp_file, 'w', encoding='utf-8') as handle:
+        json.dump(state, handle, indent=1, sort_keys=True)
+    temp_file.replace(state_file)
+
+
+def run_reason(stage: Stage, fingerprint: Optional[Dict[str, str]], state: dict, forced: bool) -> Optional[str]:
+    """Why a stage has to run, or None when it is up to date."""
+    if forced:
+        return "forced"
+
+    missing_outputs = [output for output in stage.outputs if not (PIPELINE_DIR / output).exists()]
+    if missing_outputs:
+        return f"missing output {missing_outputs[0]}"
+    if stage.external:
+        return None
+
+    previous = state['stages'].get(stage.name)
+    if previous is None:
+        return "no previous run"
+    if fingerprint is None:
+        return None
+
+    changed = sorted(path for path in set(fingerprint) | set(previous) if fingerprint.get(path) != previous.get(path))
+    if changed:
+        more = f" (+{len(changed) - 1} more)" if len(changed) > 1 else ""
+        return f"changed {changed[0]}{more}"
+    return None
+
+
+def run_stage(stage: Stage, capture: bool) -> tuple:
+    """Run one stage script in its own process; output goes to a log file when stages run concurrently."""
+    command = [sys.executable, str(PIPELINE_DIR / stage.script)]
+    started = time.perf_counter()
+    if not capture:
+        returncode = subprocess.run(command, cwd=PIPELINE_DIR).returncode
+        return returncode, time.perf_counter() - started, None
+
+    log_file = PIPELINE_DIR / LOG_DIR / f"{stage.name}.log"
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, 'w', encoding='utf-8') as handle:
+        returncode = subprocess.run(command, cwd=PIPELINE_DIR, stdout=handle, stderr=subprocess.STDOUT,
+                                    stdin=subprocess.DEVNULL).returncode
+    return returncode, time.perf_counter() - started, log_file
+
+
+def run_stage_in_process(stage: Stage) -> tuple:
+    """Run one stage script as __main__ in this process, so it shares the dataset registry."""
+    saved_argv = sys.argv
+    sys.argv = [stage.script]
+    started = time.perf_counter()
+    try:
+        runpy.run_path(str(PIPELINE_DIR / stage.script), run_name='__main__')
+        returncode = 0
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        returncode = 1
+    finally:
+        sys.argv = saved_argv
+    return returncode, time.perf_counter() - started
+
+
+def run_pipeline_in_process(stages: List[Stage], dependencies: Dict[str, Set[str]], state: dict, forced: Set[str]) -> bool:
+    """Run the stages one after another in this process, sharing loaded tables and writing outputs in the background."""
+    enable_registry()
+    os.chdir(PIPELINE_DIR)
+    hasher = InputHasher(state['hashes'])
+    ran: List[Stage] = []
+    failed: Set[str] = set()
+    failed_writes: List[str] = []
+
+    for stage in stages:
+        if dependencies[stage.name] & failed:
+            print(f"[{stage.name}] BLOCKED: upstream stage failed")
+            failed.add(stage.name)
+            continue
+
+        # Inputs published in memory are taken from there; any other input has to be on disk first
+        failed_writes += wait_for_writes([PIPELINE_DIR / path for path in stage.inputs
+                                          if not glob.has_magic(path) and not is_published(PIPELINE_DIR / path)])
+
+        # Upstream outputs may still be being written, so a stage after a rerun upstream stage always runs
+        upstream = sorted(dependencies[stage.name] & {done.name for done in ran})
+        if upstream:
+            reason = f"upstream {', '.join(upstream)} ran"
+        else:
+            reason = run_reason(stage, hasher.fingerprint(stage), state, stage.name in forced)
+        if reason is None:
+            print(f"[{stage.name}] up to date, skipped")
+            continue
+
+        print(f"[{stage.name}] running {stage.script} ({reason})")
+        returncode, elapsed = run_stage_in_process(stage)
+        if returncode == 0:
+            print(f"[{stage.name}] done in {elapsed:.1f}s")
+            ran.append(stage)
+        else:
+            print(f"[{stage.name}] FAILED with exit code {returncode} after {elapsed:.1f}s")
+            failed.add(stage.name)
+
+    print("Waiting for background writes...")
+    failed_writes += wait_for_writes()
+
+    # Fingerprints are taken once every output is on disk
+    for stage in ran:
+        if any(str((PIPELINE_DIR / output).resolve()) in failed_writes for output in stage.outputs):
+            print(f"[{stage.name}] FAILED: output could not be written")
+            failed.add(stage.name)
+            continue
+        state['stages'][stage.name] = hasher.fingerprint(stage)
+    save_state(state)
+
+    return not failed
+
+
+def dry_run(stages: List[Stage], dependencies: Dict[str, Set[str]], state: dict, forced: Set[str]):
+    """Show which stages would run, and why."""
+    hasher = InputHasher(state['hashes'])
+    scheduled = set()
+    for stage in stages:
+        upstream = sorted(dependencies[stage.name] & scheduled)
+        reason = run_reason(stage, hasher.fingerprint(stage), state, stage.name in forced)
+        if reason is None and upstream:
+            reason = f"if the outputs of {', '.join(upstream)} change"
+        if reason is None:
+            print(f"  {stage.name}  skip  {stage.script}")
+        else:
+            scheduled.add(stage.name)
+            print(f"  {stage.name}  run   {stage.script}  ({reason})")
+        if stage.external and stage.name not in forced:
+            print(f"                (external source: use --force {stage.name} to refresh)")
+
+
+def run_pipeline(stages: List[Stage], dependencies: Dict[str, Set[str]], state: dict, forced: Set[str], jobs: int) -> bool:
+    """Run every stage that needs it, starting each one as soon as its dependencies are done."""
+    hasher = InputHasher(state['hashes'])
+    pending = list(stages)
+    finished: Set[str] = set()
+    failed: Set[str] = set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for stage in list(pending):
+                if dependencies[stage.name] & failed:
+                    print(f"[{stage.name}] BLOCKED: upstream stage failed")
+                    pending.remove(stage)
+                    failed.add(stage.name)
+                    continue
+                if not dependencies[stage.name] <= finished or len(running) >= jobs:
+                    continue
+
+                pending.remove(stage)
+                # Inputs are final once every upstream stage is done, so the fingerprint is taken now
+                fingerprint = hasher.fingerprint(stage)
+                reason = run_reason(stage, fingerprint, state, stage.name in forced)
+                if reason is None:
+                    print(f"[{stage.name}] up to date, skipped")
+                    finished.add(stage.name)
+                    continue
+
+                print(f"[{stage.name}] running {stage.script} ({reason})")
+                running[executor.submit(run_stage, stage, jobs > 1)] = (stage, fingerprint)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fingerprint = running.pop(future)
+                returncode, elapsed, log_file = future.result()
+                if log_file is not None:
+                    print(f"----- {stage.name} output ({log_file}) -----")
+                    print(log_file.read_text(encoding='utf-8', errors='replace').rstrip())
+                    print("-" * 40)
+
+                if returncode == 0:
+                    print(f"[{stage.name}] done in {elapsed:.1f}s")
+                    state['stages'][stage.name] = fingerprint
+                    save_state(state)
+                    finished.add(stage.name)
+                else:
+                    print(f"[{stage.name}] FAILED with exit code {returncode} after {elapsed:.1f}s")
+                    failed.add(stage.name)
+
+    return not failed
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Run the pipeline stages whose inputs changed")
+    parser.add_argument('stages', nargs='*', help="Stages to consider, e.g. 05 06 (default: all)")
+    parser.add_argument('--dry-run', action='store_true', help="Show what would run without running it")
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE',
+                        help="Run these stages even if unchanged ('all' for every stage)")
+    parser.add_argument('--jobs', type=int, default=1, help="Number of stages to run at once (default: 1)")
+    parser.add_argument('--in-process', action='store_true',
+                        help="Run the stages in this process, sharing loaded tables and writing CSV outputs in the background")
+    return parser.parse_args()
+
+
+def main():
+    """Main execution function."""
+    args = parse_arguments()
+    all_stages = pipeline_stages()
+    names = [stage.name for stage in all_stages]
+
+    unknown = [name for name in args.stages + args.force if name not in names and name != 'all']
+    if unknown:
+        print(f"ERROR: Unknown stage(s) {', '.join(unknown)}; stages are {', '.join(names)}")
+        sys.exit(1)
+    if args.jobs < 1:
+        print("ERROR: --jobs must be at least 1")
+        sys.exit(1)
+    if args.in_process and args.jobs > 1:
+        print("ERROR: --in-process runs the stages one after another; it cannot be combined with --jobs")
+        sys.exit(1)
+
+    stages = [stage for stage in all_stages if not args.stages or stage.name in args.stages]
+    dependencies = {name: upstream & {stage.name for stage in stages}
+                    for name, upstream in stage_dependencies(all_stages).items()}
+    forced = set(names) if 'all' in args.force else set(args.force)
+    state = load_state()
+
+    print("=" * 70)
+    print("PIPELINE DRY RUN" if args.dry_run else "PIPELINE RUN")
+    print("=" * 70)
+
+    if args.dry_run:
+        dry_run(stages, dependencies, state, forced)
+        return
+
+    if args.in_process:
+        succeeded = run_pipeline_in_process(stages, dependencies, state, forced)
+    else:
+        succeeded = run_pipeline(stages, dependencies, state, forced, args.jobs)
+    if not succeeded:
+        print("\nPIPELINE FAILED")
+        sys.exit(1)
+
+    print("\n" + "=" * 70)
+    print("PIPELINE COMPLETED SUCCESSFULLY")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
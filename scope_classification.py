@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Scope Classification
+Shared "In Scope" classification for the MVS Out-Of-Scope column.
+Each distinct spelling is classified once and the result is broadcast to every row.
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+# Column written by script 03 so downstream scripts do not reclassify
+IN_SCOPE_COLUMN = "In_Scope"
+
+# Fuzzy match for "in scope" variations
+IN_SCOPE_PATTERN = re.compile(r"in scope|inscope|in-scope|scope in|scopein")
+
+
+@lru_cache(maxsize=None)
+def _classify_text(value: str) -> bool:
+    """Classify one stripped, lowercased Out-Of-Scope value."""
+    if IN_SCOPE_PATTERN.search(value):
+        return True
+
+    # Additional check for variations like "scope: in" or "in: scope"
+    if "scope" in value and "in" in value:
+        # Make sure it's not "out of scope" or similar
+        if "out" not in value and "not" not in value:
+            return True
+
+    return False
+
+
+def is_in_scope_fuzzy(out_of_scope_value) -> bool:
+    """Check if a value indicates 'In Scope' using fuzzy matching."""
+    if pd.isna(out_of_scope_value) or not str(out_of_scope_value).strip():
+        return False
+
+    return _classify_text(str(out_of_scope_value).strip().lower())
+
+
+def classify_in_scope(values: pd.Series) -> pd.Series:
+    """Classify a whole Out-Of-Scope column, evaluating each distinct value once."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    verdicts = [is_in_scope_fuzzy(value) for value in uniques]
+    # Append False so the NA sentinel (-1) maps to "not in scope"
+    lookup = np.array(verdicts + [False], dtype=bool)
+    return pd.Series(lookup[codes], index=values.index, name=IN_SCOPE_COLUMN)
+
+
+def in_scope_mask(df: pd.DataFrame, out_of_scope_col: str = "Out_of_Scope") -> pd.Series:
+    """Return the In_Scope column from script 03 output, classifying only if it is missing."""
+    if IN_SCOPE_COLUMN in df.columns:
+        column = df[IN_SCOPE_COLUMN]
+        if column.dtype == bool:
+            return column
+        # CSV round-trip may leave the flag as text
+        return column.astype(str).str.strip().str.lower().isin(["true", "1"])
+
+    return classify_in_scope(df[out_of_scope_col])
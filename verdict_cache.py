@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Verdict Cache
+Persistent SQLite store of product-match verdicts, keyed by the normalised
+(MVS molecule, RIM product name) pair and a version hash of the matching rules.
+Rows written under any other rules version are dropped when the cache is opened.
+"""
+
+import pathlib
+import sqlite3
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+
+VERDICT_CACHE_FILE = pathlib.Path(".pipeline_cache/product_match_verdicts.sqlite")
+
+PairKey = Tuple[str, str]
+
+
+def normalize_pair_key(mvs_molecule: Optional[str], rim_product_name: Optional[str]) -> PairKey:
+    """Cache key for one pair: stripped, lowercased text, with missing values as empty strings."""
+    def normalize(value):
+        return "" if pd.isna(value) else str(value).strip().lower()
+
+    return normalize(mvs_molecule), normalize(rim_product_name)
+
+
+class VerdictCache:
+    """Verdicts for one rules version, stored in a SQLite file."""
+
+    def __init__(self, cache_file: pathlib.Path, rules_version: str):
+        self.cache_file = pathlib.Path(cache_file)
+        self.rules_version = rules_version
+        self.hits = 0
+        self.misses = 0
+
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.cache_file)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " rules_version TEXT NOT NULL, mvs_key TEXT NOT NULL, rim_key TEXT NOT NULL, verdict TEXT NOT NULL,"
+            " PRIMARY KEY (rules_version, mvs_key, rim_key))"
+        )
+
+        # Verdicts from other rules versions can never be hit again
+        stale = self.connection.execute(
+            "DELETE FROM verdicts WHERE rules_version != ?", (rules_version,)
+        ).rowcount
+        self.connection.commit()
+        if stale:
+            print(f"  Verdict cache: dropped {stale:,} verdicts from previous matching rules")
+
+    def lookup(self, keys: Iterable[PairKey]) -> Dict[PairKey, str]:
+        """Return the cached verdicts for the given keys and record hits and misses."""
+        wanted = set(keys)
+
+        # Join the requested keys against the primary key instead of scanning every stored verdict
+        self.connection.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS wanted_keys (mvs_key TEXT NOT NULL, rim_key TEXT NOT NULL)"
+        )
+        self.connection.execute("DELETE FROM wanted_keys")
+        self.connection.executemany("INSERT INTO wanted_keys (mvs_key, rim_key) VALUES (?, ?)", wanted)
+        rows = self.connection.execute(
+            "SELECT v.mvs_key, v.rim_key, v.verdict FROM wanted_keys w"
+            " JOIN verdicts v ON v.rules_version = ? AND v.mvs_key = w.mvs_key AND v.rim_key = w.rim_key",
+            (self.rules_version,)
+        )
+        cached = {(mvs_key, rim_key): verdict for mvs_key, rim_key, verdict in rows}
+        self.connection.execute("DELETE FROM wanted_keys")
+
+        self.hits += len(cached)
+        self.misses += len(wanted) - len(cached)
+        return cached
+
+    def store(self, verdicts: Dict[PairKey, str]):
+        """Save newly evaluated verdicts."""
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO verdicts (rules_version, mvs_key, rim_key, verdict) VALUES (?, ?, ?, ?)",
+            ((self.rules_version, mvs_key, rim_key, verdict) for (mvs_key, rim_key), verdict in verdicts.items())
+        )
+        self.connection.commit()
+
+    def close(self):
+        """Close the SQLite connection."""
+        self.connection.close()